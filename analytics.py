@@ -0,0 +1,180 @@
+import os
+import logging
+import threading
+import numpy as np
+
+import storage
+import results_db
+
+# Columnar copy of every stored HR and technical entry. Numeric/key columns
+# live in SNAPSHOT_FILE; the bulky text columns are kept in SNAPSHOT_TEXT_FILE
+# and only read when a caller asks for them.
+SNAPSHOT_FILE = os.getenv("RESULTS_SNAPSHOT_FILE", "results_snapshot.npz")
+SNAPSHOT_TEXT_FILE = os.getenv("RESULTS_SNAPSHOT_TEXT_FILE", "results_snapshot_text.npz")
+
+ROUNDS = ("hr", "tech")
+TEXT_COLUMNS = ("question", "answer", "feedback")
+
+
+def _answer_text(entry):
+    answer = entry.get("answer", entry.get("transcript", ""))
+    if isinstance(answer, dict):
+        answer = answer.get("text", "")
+    return str(answer or "")
+
+
+def _score(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _timestamp(value):
+    try:
+        return np.datetime64(value).astype("datetime64[s]") if value else np.datetime64("NaT")
+    except (TypeError, ValueError):
+        return np.datetime64("NaT")
+
+
+def build_columns():
+    """Flatten all stored results into parallel column lists."""
+    columns = {name: [] for name in ("candidate", "domain", "round", "score", "timestamp") + TEXT_COLUMNS}
+    for round_code, results in enumerate((storage.load_hr_results(), storage.load_tech_results())):
+        for candidate_id, value in results.items():
+            for entry in results_db.flatten_entries(value):
+                columns["candidate"].append(candidate_id)
+                columns["domain"].append(str(entry.get("domain") or ""))
+                columns["round"].append(round_code)
+                columns["score"].append(_score(entry.get("score")))
+                columns["timestamp"].append(_timestamp(entry.get("timestamp")))
+                columns["question"].append(str(entry.get("question") or ""))
+                columns["answer"].append(_answer_text(entry))
+                columns["feedback"].append(str(entry.get("feedback") or ""))
+    return columns
+
+
+def _savez_atomic(path, **arrays):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def write_snapshot():
+    columns = build_columns()
+    _savez_atomic(
+        SNAPSHOT_FILE,
+        candidate=np.array(columns["candidate"], dtype=str),
+        domain=np.array(columns["domain"], dtype=str),
+        round=np.array(columns["round"], dtype=np.int8),
+        score=np.array(columns["score"], dtype=np.float32),
+        timestamp=np.array(columns["timestamp"], dtype="datetime64[s]"),
+    )
+    _savez_atomic(SNAPSHOT_TEXT_FILE, **{name: np.array(columns[name], dtype=str) for name in TEXT_COLUMNS})
+    logging.info(f"Wrote results snapshot with {len(columns['candidate'])} rows")
+
+
+class ResultsSnapshot:
+    """Read-only column view over the snapshot files."""
+
+    def __init__(self, path=SNAPSHOT_FILE, text_path=SNAPSHOT_TEXT_FILE):
+        with np.load(path) as data:
+            self.columns = {name: data[name] for name in data.files}
+        self.text_path = text_path
+        self._text = {}
+
+    def __len__(self):
+        return len(self.columns["candidate"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def text(self, name):
+        """Load a text column on first use."""
+        if name not in self._text:
+            with np.load(self.text_path) as data:
+                self._text[name] = data[name]
+        return self._text[name]
+
+    def mask(self, candidate=None, domain=None, round=None):
+        selected = np.ones(len(self), dtype=bool)
+        if candidate is not None:
+            selected &= self.columns["candidate"] == candidate
+        if domain is not None:
+            selected &= np.char.lower(self.columns["domain"]) == domain.strip().lower()
+        if round is not None:
+            selected &= self.columns["round"] == ROUNDS.index(round)
+        return selected
+
+    def domain_summary(self, round=None):
+        """Return {domain: (answers, mean score)} computed with bincount over the columns."""
+        selected = self.mask(round=round) & ~np.isnan(self.columns["score"])
+        domains, inverse = np.unique(self.columns["domain"][selected], return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(domains))
+        sums = np.bincount(inverse, weights=self.columns["score"][selected], minlength=len(domains))
+        return {d: (int(c), float(s / c)) for d, c, s in zip(domains, counts, sums) if d}
+
+    def candidate_means(self, domain=None, round=None):
+        """Return (candidate ids, mean score per candidate)."""
+        selected = self.mask(domain=domain, round=round) & ~np.isnan(self.columns["score"])
+        candidates, inverse = np.unique(self.columns["candidate"][selected], return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(candidates))
+        sums = np.bincount(inverse, weights=self.columns["score"][selected], minlength=len(candidates))
+        return candidates, sums / np.maximum(counts, 1)
+
+    def percentile(self, score, domain=None, round=None):
+        """Share of candidates (in percent) whose mean score is below score."""
+        _, means = self.candidate_means(domain=domain, round=round)
+        if not len(means):
+            return None
+        return float(np.mean(means < score) * 100)
+
+
+# SNAPSHOT MAINTENANCE
+
+_lock = threading.Lock()
+_refresh_requested = threading.Event()
+_worker = None
+_snapshot = None
+_snapshot_mtime = None
+
+
+def _refresh_loop():
+    while True:
+        _refresh_requested.wait()
+        _refresh_requested.clear()
+        try:
+            write_snapshot()
+        except Exception as e:
+            logging.error(f"Results snapshot refresh failed: {e}")
+
+
+def request_refresh(*_):
+    """Ask the background worker to rebuild the snapshot; bursts of writes coalesce."""
+    global _worker
+    with _lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_refresh_loop, daemon=True)
+            _worker.start()
+    _refresh_requested.set()
+
+
+def load_snapshot():
+    """Return the current snapshot, building it on first use and re-reading it when the file changes."""
+    global _snapshot, _snapshot_mtime
+    with _lock:
+        if not os.path.exists(SNAPSHOT_FILE):
+            write_snapshot()
+        mtime = os.stat(SNAPSHOT_FILE).st_mtime_ns
+        if _snapshot is None or mtime != _snapshot_mtime:
+            _snapshot = ResultsSnapshot()
+            _snapshot_mtime = mtime
+        return _snapshot
+
+
+storage.add_write_listener(request_refresh)
+
+
+if __name__ == "__main__":
+    write_snapshot()
@@ -0,0 +1,129 @@
+"""
+Re-transcribe saved recordings offline, e.g. after a model upgrade.
+
+Usage:
+    python batch_transcribe.py [recordings] [--model base] [--engine whisper] [--workers 2]
+                               [--output recordings/transcriptions.jsonl]
+
+Every WAV under the directory is transcribed in a process pool; each worker
+loads its own model once. Results are appended to a JSONL log in the storage
+format ({"candidate_id", "entry"} records, keyed by the recording's path), one
+fsync'd record per finished file. A rerun skips recordings that already have a
+successful result for the same engine and model, so an interrupted batch
+resumes where it stopped.
+"""
+import argparse
+import glob
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from storage import append_log, replay_log
+from transcripts import compact_entry
+
+_worker = {}
+
+
+def _init_worker(model_size, engine, device, precision, threads):
+    """Runs once per worker process: pin the thread count and load the model."""
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from speech_models import registry
+    model = registry.get(model_size, device, precision, engine)
+    model.load()
+    _worker.update(model_size=model_size, engine=engine, device=device, precision=precision)
+
+
+def transcribe_file(path):
+    """Worker: transcribe one WAV file with this process's model."""
+    from voice import VoiceRecorder, load_wav
+    sample_rate, audio = load_wav(path)
+    recorder = VoiceRecorder(
+        model_size=_worker["model_size"], sample_rate=sample_rate, engine=_worker["engine"],
+        device=_worker["device"], precision=_worker["precision"]
+    )
+    # Re-transcribing after a model upgrade is the point; never answer from the cache
+    return recorder.transcribe(audio, use_cache=False)
+
+
+def find_recordings(directory):
+    return sorted(glob.glob(os.path.join(directory, "**", "*.wav"), recursive=True))
+
+
+def completed(output, engine, model_size):
+    """Recordings that already have an error-free result for this engine and model."""
+    done = set()
+    for recording, entries in replay_log(output, {}).items():
+        for entry in entries if isinstance(entries, list) else [entries]:
+            if (entry.get("engine") == engine and entry.get("model_size") == model_size
+                    and not entry.get("error")):
+                done.add(recording)
+    return done
+
+
+def run_batch(directory, output, model_size="base", engine="whisper", workers=2, device=None, precision=None):
+    recordings = find_recordings(directory)
+    done = completed(output, engine, model_size)
+    todo = [path for path in recordings if os.path.relpath(path, directory) not in done]
+    print(f"{len(recordings)} recordings, {len(recordings) - len(todo)} already done, {len(todo)} to transcribe")
+    if not todo:
+        return 0
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    failures = 0
+    # spawn: forking a process that may already hold torch/OpenMP threads can deadlock
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_size, engine, device, precision, threads),
+    ) as pool:
+        futures = {pool.submit(transcribe_file, path): path for path in todo}
+        for i, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            recording = os.path.relpath(path, directory)
+            try:
+                transcription = future.result()
+                error = transcription.get("error")
+            except Exception as e:
+                logging.error(f"Transcribing {path} failed: {e}")
+                transcription, error = None, str(e)
+            failures += bool(error)
+            entry = {
+                "recording": recording,
+                "engine": engine,
+                "model_size": model_size,
+                "transcript": transcription,
+                "error": error,
+                "timestamp": datetime.now().isoformat()
+            }
+            append_log(output, recording, [compact_entry(entry)])
+            print(f"[{i}/{len(todo)}] {recording}: {'error: ' + error if error else 'ok'}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", nargs="?", default="recordings")
+    parser.add_argument("--output", help="JSONL results log (default: <directory>/transcriptions.jsonl)")
+    parser.add_argument("--model", default="base", help="Whisper model size")
+    parser.add_argument("--engine", default=os.getenv("ASR_ENGINE", "whisper"), help="Speech-recognition engine")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes, each with its own model")
+    parser.add_argument("--device")
+    parser.add_argument("--precision")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    output = args.output or os.path.join(args.directory, "transcriptions.jsonl")
+    failures = run_batch(args.directory, output, args.model, args.engine, args.workers, args.device, args.precision)
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Compare the in-memory transcription path with the original temp-WAV path,
+or compare speech-recognition engines on a directory of reference clips.
+
+Usage:
+    python benchmark_transcription.py [path/to/clip.wav] [--model base] [--repeats 3]
+    python benchmark_transcription.py --clips path/to/clips [--engines whisper,whisper-int8,faster-whisper]
+
+Without a clip, a synthetic 20 s signal at 44.1 kHz is used; that is enough to
+measure the I/O, ffmpeg and resampling overhead, but not transcript quality.
+
+With --clips, every <name>.wav that has a <name>.txt reference transcript next
+to it is transcribed by each engine, reporting the real-time factor (processing
+time / audio duration, lower is faster) and word error rate against the references.
+"""
+import argparse
+import glob
+import os
+import re
+import statistics
+import time
+
+import numpy as np
+
+from voice import VoiceRecorder, load_wav, resample_audio
+from speech_models import ENGINES
+
+
+def synthetic_clip(seconds=20.0, sample_rate=44100):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    rng = np.random.default_rng(0)
+    audio = 0.1 * np.sin(2 * np.pi * 220 * t) + 0.01 * rng.standard_normal(t.size)
+    return sample_rate, audio.astype(np.float32).reshape(-1, 1)
+
+
+def time_call(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label, timings):
+    print(f"{label:<28} median {statistics.median(timings):8.3f}s  min {min(timings):8.3f}s")
+
+
+def normalize_words(text):
+    return re.sub(r"[^a-z0-9' ]+", " ", text.lower()).split()
+
+
+def word_errors(reference, hypothesis):
+    """Word-level edit distance (substitutions + deletions + insertions)."""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1], len(ref)
+
+
+def load_clips(directory):
+    clips = []
+    for wav_path in sorted(glob.glob(os.path.join(directory, "*.wav"))):
+        txt_path = os.path.splitext(wav_path)[0] + ".txt"
+        if not os.path.exists(txt_path):
+            print(f"Skipping {wav_path}: no reference transcript")
+            continue
+        with open(txt_path, encoding="utf-8") as f:
+            reference = f.read()
+        sample_rate, audio = load_wav(wav_path)
+        if audio.ndim > 1:
+            audio = audio.mean(axis=1)
+        clips.append((os.path.basename(wav_path), resample_audio(audio, sample_rate), reference))
+    return clips
+
+
+def compare_engines(clips_dir, engines, model_size):
+    clips = load_clips(clips_dir)
+    if not clips:
+        raise SystemExit(f"No .wav clips with .txt references in {clips_dir}")
+    audio_seconds = sum(len(audio) for _, audio, _ in clips) / 16000
+    print(f"{len(clips)} clips, {audio_seconds:.1f}s of audio, model '{model_size}'")
+    print(f"{'engine':<16} {'load':>8} {'RTF':>8} {'WER':>8}")
+
+    for engine in engines:
+        recorder = VoiceRecorder(model_size=model_size, sample_rate=16000, engine=engine, trim_silence=False)
+        start = time.perf_counter()
+        recorder.model.load()
+        load_time = time.perf_counter() - start
+        # Untimed first pass so one-off kernel setup is not counted; the
+        # transcription cache is bypassed so no clip is answered from it
+        recorder.transcribe(clips[0][1], use_cache=False)
+
+        elapsed, errors, words = 0.0, 0, 0
+        for name, audio, reference in clips:
+            start = time.perf_counter()
+            result = recorder.transcribe(audio, use_cache=False)
+            elapsed += time.perf_counter() - start
+            clip_errors, clip_words = word_errors(reference, result["text"])
+            errors += clip_errors
+            words += clip_words
+        print(f"{engine:<16} {load_time:7.1f}s {elapsed / audio_seconds:8.3f} {errors / max(words, 1):8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("clip", nargs="?", help="WAV file to transcribe")
+    parser.add_argument("--model", default="base", help="Whisper model size")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--clips", help="Directory of <name>.wav clips with <name>.txt references")
+    parser.add_argument("--engines", default=",".join(ENGINES), help="Comma-separated engines to compare with --clips")
+    args = parser.parse_args()
+
+    if args.clips:
+        compare_engines(args.clips, [e.strip() for e in args.engines.split(",") if e.strip()], args.model)
+        return
+
+    sample_rate, audio = load_wav(args.clip) if args.clip else synthetic_clip()
+    print(f"Clip: {len(audio) / sample_rate:.1f}s at {sample_rate} Hz, model '{args.model}', {args.repeats} repeats")
+
+    recorder = VoiceRecorder(model_size=args.model, sample_rate=sample_rate)
+
+    report("resample only (numpy)", time_call(lambda: resample_audio(audio, sample_rate), args.repeats))
+    # One untimed call each so model warm-up does not favour the second path.
+    # The in-memory path skips the transcription cache, which the WAV path never uses.
+    recorder.transcribe(audio, use_cache=False)
+    recorder.transcribe_via_wav(audio)
+    report("temp WAV + ffmpeg", time_call(lambda: recorder.transcribe_via_wav(audio), args.repeats))
+    report("in-memory array", time_call(lambda: recorder.transcribe(audio, use_cache=False), args.repeats))
+
+
+if __name__ == "__main__":
+    main()
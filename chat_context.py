@@ -0,0 +1,97 @@
+import os
+import logging
+
+from llm import achat, run_async
+
+# Well under a minute of the model's LLM_TPM budget, so a turn rarely waits on the rate limiter
+CHATBOT_CONTEXT_TOKENS = int(os.getenv("CHATBOT_CONTEXT_TOKENS", 3000))
+CHATBOT_SUMMARY_TOKENS = int(os.getenv("CHATBOT_SUMMARY_TOKENS", 300))
+SUMMARY_MODEL = "llama3-8b-8192"
+MESSAGE_OVERHEAD_TOKENS = 4  # role and separators around each message
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # optional dependency; fall back to a character estimate
+    _encoding = None
+
+
+def estimate_tokens(text):
+    """Approximate token count; cl100k_base is close enough to Llama 3's tokenizer for budgeting."""
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def message_tokens(message):
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+async def summarize_turns(previous_summary, turns):
+    transcript = "\n".join(f"{turn['role'].capitalize()}: {turn['content']}" for turn in turns)
+    prompt = (
+        f"Summary of the conversation so far:\n{previous_summary or '(none)'}\n\n"
+        f"Newer messages:\n{transcript}\n\n"
+        f"Rewrite the summary to include the newer messages. Keep facts about the user "
+        f"(target role, skills, weak areas, goals) and any advice already given. "
+        f"Reply with the summary only, under {CHATBOT_SUMMARY_TOKENS // 2} words."
+    )
+    return await achat(
+        model=SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": "You summarize career-coaching conversations."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=CHATBOT_SUMMARY_TOKENS,
+        priority="background"
+    )
+
+
+class ChatContext:
+    """
+    Builds the messages sent for each chatbot turn within a token budget.
+
+    The system prompt and the most recent turns that fit are sent verbatim.
+    Older turns are folded into a rolling summary; the summary is rewritten on
+    the LLM event loop, so a turn never waits for it and uses the latest
+    finished summary instead.
+    """
+
+    def __init__(self, budget=CHATBOT_CONTEXT_TOKENS):
+        self.budget = budget
+        self.summary = ""
+        self.summarized_upto = 1   # history[1:summarized_upto] is covered by the summary
+        self._pending = None       # (future, upto) of the summary being written
+
+    def _collect_summary(self):
+        if self._pending is None or not self._pending[0].done():
+            return
+        future, upto = self._pending
+        self._pending = None
+        try:
+            self.summary = future.result().strip()
+            self.summarized_upto = upto
+        except Exception as e:
+            logging.error(f"Chat summary failed, keeping the previous one: {e}")
+
+    def messages(self, history):
+        """history[0] is the system prompt; returns the message list for the next completion."""
+        self._collect_summary()
+        context = [history[0]]
+        if self.summary:
+            context.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+        remaining = self.budget - sum(message_tokens(message) for message in context)
+
+        start = len(history)
+        while start > self.summarized_upto:
+            cost = message_tokens(history[start - 1])
+            # The newest message always goes in, even on its own it is over budget
+            if cost > remaining and start < len(history):
+                break
+            remaining -= cost
+            start -= 1
+
+        if start > self.summarized_upto and self._pending is None:
+            logging.info(f"Folding chat turns {self.summarized_upto}-{start - 1} into the summary")
+            self._pending = (run_async(summarize_turns(self.summary, history[self.summarized_upto:start])), start)
+        return context + history[start:]
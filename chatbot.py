@@ -1,12 +1,27 @@
 import streamlit as st
-from groq import Groq
-import os
-from dotenv import load_dotenv
+from llm import stream_chat
+from chat_context import ChatContext
 
-def chatbot_page():
-    load_dotenv()
-    client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+def render_message(role, content, target=st):
+    """Draw one chat bubble; target can be an st.empty() placeholder to redraw it in place"""
+    content = content.replace("\n", "<br>")
+
+    if role == "user":
+        target.markdown(f'''
+    <div class="chat-row user">
+        <div class="chat-bubble user">{content}</div>
+        <div class="avatar user"><i class="fa-solid fa-circle-user"></i></div>
+    </div>
+    ''', unsafe_allow_html=True)
+    elif role == "assistant":
+        target.markdown(f'''
+        <div class="chat-row bot">
+            <div class="avatar bot"><i class="fa-brands fa-bots"></i></div>
+            <div class="chat-bubble bot">{content}</div>
+        </div>
+    ''', unsafe_allow_html=True)
 
+def chatbot_page():
     if st.button("⬅️ Back to Interview"):
         st.session_state.page = "interview"
         st.rerun()
@@ -84,41 +99,36 @@ def chatbot_page():
             )}
         ]
 
+    if "chatbot_context" not in st.session_state:
+        st.session_state.chatbot_context = ChatContext()
+
     user_input = st.chat_input("Ask me anything...")
 
     if user_input:
         st.session_state.chatbot_history.append({"role": "user", "content": user_input})
+
+    # Render chat UI
+    st.markdown('<div class="chat-container">', unsafe_allow_html=True)
+    for msg in st.session_state.chatbot_history[1:]:  # Skip system prompt
+        render_message(msg["role"], msg["content"])
+
+    if user_input:
+        # Draw the reply token by token instead of waiting for the full completion
+        bubble = st.empty()
+        chunks = []
         try:
-            response = client.chat.completions.create(
+            for chunk in stream_chat(
                 model="llama3-70b-8192",
-                messages=st.session_state.chatbot_history
-            )
-            reply = response.choices[0].message.content
+                messages=st.session_state.chatbot_context.messages(st.session_state.chatbot_history)
+            ):
+                chunks.append(chunk)
+                render_message("assistant", "".join(chunks) + "▌", bubble)
+            reply = "".join(chunks)
         except Exception as e:
             reply = f"❌ Error: {e}"
+        render_message("assistant", reply, bubble)
 
         st.session_state.chatbot_history.append({"role": "assistant", "content": reply})
-
-    # Render chat UI
-    st.markdown('<div class="chat-container">', unsafe_allow_html=True)
-    for msg in st.session_state.chatbot_history[1:]:  # Skip system prompt
-        role = msg["role"]
-        content = msg["content"].replace("\n", "<br>")
-
-        if role == "user":
-            st.markdown(f'''
-        <div class="chat-row user">
-            <div class="chat-bubble user">{content}</div>
-            <div class="avatar user"><i class="fa-solid fa-circle-user"></i></div>
-        </div>
-        ''', unsafe_allow_html=True)
-        elif role == "assistant":
-            st.markdown(f'''
-            <div class="chat-row bot">
-                <div class="avatar bot"><i class="fa-brands fa-bots"></i></div>
-                <div class="chat-bubble bot">{content}</div>
-            </div>
-        ''', unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
 # if __name__ == "__main__":
@@ -1,38 +1,84 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import os
-from groq import Groq
-from dotenv import load_dotenv
 import urllib.parse
-
-load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-groq_client = Groq(api_key=GROQ_API_KEY)
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+import analytics
+import storage
+import results_db
+from llm import chat, achat, stream_chat, run_async
 
 # Constants
 HR_RESULTS_FILE = "hr_results.json"
 TECH_RESULTS_FILE = "tech_results.json"
 MAX_COURSES = 5
 MAX_JOBS = 5
-
-def display_table(data, label):
-    """Display data in a formatted table"""
-    if not data:
+FEEDBACK_CACHE_TTL = 24 * 3600       # same domain + answers -> same feedback
+JOB_ROLES_CACHE_TTL = 7 * 24 * 3600  # job roles only depend on the domain
+DASHBOARD_MEMO_SIZE = 256
+FEEDBACK_COLUMNS = ["candidate_id", "domain", "question", "answer", "score", "feedback"]
+
+# (candidate_id, domain, answers hash) -> {"feedback": text once streamed, "job_roles": Future,
+#                                          "rounds": round_frame() per round once built}
+_dashboard_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+def round_frame(data):
+    """Feedback table and score total for one round; built once per interview, not per rerun"""
+    df = pd.DataFrame(data)
+    table = df[[col for col in FEEDBACK_COLUMNS if col in df.columns]]
+    if "score" not in df.columns:
+        return {"table": table, "count": len(df), "total": 0}
+    return {
+        "table": table.style.highlight_max(subset=['score'], color='lightgreen'),
+        "count": len(df),
+        "total": int(pd.to_numeric(df["score"], errors="coerce").fillna(0).sum()),
+    }
+
+def display_table(frame, label):
+    """Display a round_frame() in a formatted table"""
+    if not frame["count"]:
         st.warning(f"No {label} data found.")
         return
 
-    df = pd.DataFrame(data)
-    columns = ["candidate_id", "domain", "question", "answer", "score", "feedback"]
-    existing_cols = [col for col in columns if col in df.columns]
-    df = df[existing_cols]
     st.markdown(f"### {label} Feedback")
-    st.dataframe(df.style.highlight_max(subset=['score'], color='lightgreen'), 
-                use_container_width=True)
+    st.dataframe(frame["table"], use_container_width=True)
+
+def domain_comparison_stats(domain, avg_score):
+    """(answers, domain average, percentile) from SQL on the sqlite backend, else the analytics snapshot"""
+    if storage.RESULTS_BACKEND == "sqlite":
+        return results_db.domain_comparison(domain, avg_score)
+    snapshot = analytics.load_snapshot()
+    summary = snapshot.domain_summary()
+    domain_key = next((d for d in summary if d.strip().lower() == domain.strip().lower()), None)
+    if not domain_key:
+        return None
+    answers, domain_avg = summary[domain_key]
+    return answers, domain_avg, snapshot.percentile(avg_score, domain=domain)
+
+def display_domain_comparison(domain, avg_score):
+    """Compare the candidate with everyone else interviewed for the same domain"""
+    try:
+        stats = domain_comparison_stats(domain, avg_score)
+    except Exception as e:
+        st.info(f"Comparison with other candidates is unavailable: {e}")
+        return
+    if stats is None:
+        st.caption(f"No earlier interviews found for `{domain}` yet.")
+        return
 
-def generate_domain_feedback(domain, hr_data, tech_data):
-    client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    answers, domain_avg, percentile = stats
+    cols = st.columns(2)
+    cols[0].metric("Your Average", f"{avg_score:.1f}/10", delta=f"{avg_score - domain_avg:+.1f} vs domain average",
+                   help=f"Domain average is {domain_avg:.1f}/10 over {answers} answers")
+    if percentile is not None:
+        cols[1].metric("Percentile", f"{percentile:.0f}%", help="Share of candidates in this domain with a lower average")
 
+def stream_domain_feedback(domain, hr_data, tech_data):
+    """Yield the personalized feedback text chunk by chunk as the model writes it"""
     # Combine all answers for context
     combined_answers = " ".join([item.get("answer", "") for item in (hr_data + tech_data)])
 
@@ -50,15 +96,18 @@ def generate_domain_feedback(domain, hr_data, tech_data):
     Give feedback in bullet points and be specific to the domain.
     """
 
-    response = client.chat.completions.create(
+    yield from stream_chat(
         model="llama-3.3-70b-versatile",
         messages=[
             {"role": "system", "content": "You are a career guidance coach."},
             {"role": "user", "content": prompt}
-        ]
+        ],
+        cache_ttl=FEEDBACK_CACHE_TTL,
+        priority="extras"
     )
 
-    return response.choices[0].message.content.strip()
+def generate_domain_feedback(domain, hr_data, tech_data):
+    return "".join(stream_domain_feedback(domain, hr_data, tech_data)).strip()
 
 def fetch_course_links(domain):
     """Return only course search links based on the predicted domain"""
@@ -91,25 +140,59 @@ def search_job_portals(domain, location):
         ("Naukri", f"https://www.naukri.com/{query}-jobs-in-{urllib.parse.quote_plus(location)}")
     ]
 
-def fetch_jobs_with_agent(domain, location="India"):
-    """Agentic job search wrapper: combines reasoning + actionable links"""
-    st.subheader("💼 AI-Powered Job Recommendations")
-    st.caption(f"Based on your interest in `{domain}` and location `{location}`")
-
+def _job_roles_messages(domain):
     planning_prompt = f"""
     You're helping a fresher in the {domain} domain find jobs.
     What 5 job titles or roles should they search for as a beginner?
     Respond as a comma-separated list.
     """
-    response = groq_client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[
-            {"role": "system", "content": "You are a job planning assistant."},
-            {"role": "user", "content": planning_prompt}
-        ]
-    )
+    return [
+        {"role": "system", "content": "You are a job planning assistant."},
+        {"role": "user", "content": planning_prompt}
+    ]
+
+def fetch_job_roles(domain):
+    return chat(model="llama-3.3-70b-versatile", messages=_job_roles_messages(domain),
+                cache_ttl=JOB_ROLES_CACHE_TTL, priority="extras").strip()
+
+async def afetch_job_roles(domain):
+    reply = await achat(model="llama-3.3-70b-versatile", messages=_job_roles_messages(domain),
+                        cache_ttl=JOB_ROLES_CACHE_TTL, priority="extras")
+    return reply.strip()
+
+def answers_hash(hr_data, tech_data):
+    answers = [(item.get("question"), item.get("answer")) for item in (hr_data + tech_data)]
+    return hashlib.blake2b(json.dumps(answers, default=str).encode("utf-8"), digest_size=16).hexdigest()
+
+def dashboard_llm_results(candidate_id, domain, hr_data, tech_data):
+    """
+    Memoized LLM results for one interview's dashboard.
 
-    job_roles = response.choices[0].message.content.strip()
+    The job-roles request starts on the LLM event loop as soon as the entry is
+    created, so it runs while the feedback streams; reruns reuse the entry.
+    """
+    key = (candidate_id, domain, answers_hash(hr_data, tech_data))
+    with _memo_lock:
+        entry = _dashboard_memo.get(key)
+        if entry is None:
+            entry = {"feedback": None, "job_roles": run_async(afetch_job_roles(domain))}
+            _dashboard_memo[key] = entry
+            while len(_dashboard_memo) > DASHBOARD_MEMO_SIZE:
+                _dashboard_memo.popitem(last=False)
+        _dashboard_memo.move_to_end(key)
+    return key, entry
+
+def forget_dashboard_results(key):
+    with _memo_lock:
+        _dashboard_memo.pop(key, None)
+
+def fetch_jobs_with_agent(domain, location="India", job_roles=None):
+    """Agentic job search wrapper: combines reasoning + actionable links"""
+    st.subheader("💼 AI-Powered Job Recommendations")
+    st.caption(f"Based on your interest in `{domain}` and location `{location}`")
+
+    if job_roles is None:
+        job_roles = fetch_job_roles(domain)
     st.write(job_roles)
 
     st.markdown("#### 🔗 Search Job Portals")
@@ -127,11 +210,17 @@ def show_dashboard(hr_data, tech_data, candidate_id, domain):
         st.warning("⚠️ No interview data found.")
         return
 
-    num_hr = len(hr_data)
-    num_tech = len(tech_data)
+    # Starts the job-roles request now, alongside the feedback stream below
+    memo_key, llm_results = dashboard_llm_results(candidate_id, domain, hr_data, tech_data)
+    if llm_results.get("rounds") is None:
+        llm_results["rounds"] = (round_frame(hr_data), round_frame(tech_data))
+    hr_frame, tech_frame = llm_results["rounds"]
+
+    num_hr = hr_frame["count"]
+    num_tech = tech_frame["count"]
     total_questions = num_hr + num_tech
-    total_hr_score = sum(item.get("score", 0) for item in hr_data)
-    total_tech_score = sum(item.get("score", 0) for item in tech_data)
+    total_hr_score = hr_frame["total"]
+    total_tech_score = tech_frame["total"]
     avg_score = round((total_hr_score + total_tech_score) / total_questions, 2) if total_questions > 0 else 0
 
     st.title("📊 Interview Performance Dashboard")
@@ -157,17 +246,33 @@ def show_dashboard(hr_data, tech_data, candidate_id, domain):
                              labels={'x': 'Round', 'y': 'Average Score'})
             st.plotly_chart(fig_bar, use_container_width=True)
 
+        st.subheader("👥 Compared With Other Candidates")
+        display_domain_comparison(domain, avg_score)
+
     with tab2:
-        display_table(hr_data, "HR Round")
-        display_table(tech_data, "Technical Round")
+        display_table(hr_frame, "HR Round")
+        display_table(tech_frame, "Technical Round")
 
         st.header("📌 Personalized Feedback")
-        with st.spinner("Generating feedback based on your answers..."):
-            feedback = generate_domain_feedback(domain, hr_data, tech_data)
-            st.markdown(feedback)
+        placeholder = st.empty()
+        if llm_results["feedback"] is None:
+            # Render tokens as they arrive rather than after the whole completion
+            placeholder.caption("Generating feedback based on your answers...")
+            chunks = []
+            for chunk in stream_domain_feedback(domain, hr_data, tech_data):
+                chunks.append(chunk)
+                placeholder.markdown("".join(chunks) + "▌")
+            llm_results["feedback"] = "".join(chunks).strip()
+        placeholder.markdown(llm_results["feedback"])
 
     display_course_recommendations(domain)
-    fetch_jobs_with_agent(domain)
+    try:
+        job_roles = llm_results["job_roles"].result()
+    except Exception as e:
+        # Don't memoize the failure; the next rerun asks again
+        forget_dashboard_results(memo_key)
+        job_roles = f"❌ Could not fetch job recommendations: {e}"
+    fetch_jobs_with_agent(domain, job_roles=job_roles)
 
     st.divider()
     st.caption("ℹ️ Recommendations powered by Groq AI")
@@ -73,26 +73,15 @@
 
 
 import os
-from groq import Groq
-from dotenv import load_dotenv
 import logging
-
-load_dotenv()
+from llm import client, stream_chat  # shared pooled client; main passes it back into identify_domain
 
 #----logging setup----------
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-#---------groq api key---------------
-try:
-    groq_api_key = os.getenv("GROQ_API_KEY")
-    if not groq_api_key:
-        raise ValueError("GROQ_API_KEY is not set in the environment variables.")
-    client = Groq(api_key=groq_api_key)
-    logger.info("Groq client initialized successfully.")
-except Exception as e:
-    logger.error(f"[Initialization Error] Failed to create Groq client: {e}")
-    client = None
+# The same job description maps to the same domain, including on "recheck"
+DOMAIN_CACHE_TTL = int(os.getenv("DOMAIN_CACHE_TTL", 7 * 24 * 3600))
 
 #---------domain identification function------
 def identify_domain(job_description, client):
@@ -120,23 +109,21 @@ def identify_domain(job_description, client):
 
     try:
         logger.info("Sending request to Groq LLM API...")
-        stream = client.chat.completions.create(
+        stream = stream_chat(
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": job_description}
             ],
             model="llama3-70b-8192",
-            stream=True
+            cache_ttl=DOMAIN_CACHE_TTL
         )
 
-        response = ""
-        for chunk in stream:
-            content = chunk.choices[0].delta.content
-            if content:
-                response += content
-                logger.debug(f"Received chunk: {content}")
+        chunks = []
+        for content in stream:
+            chunks.append(content)
+            logger.debug(f"Received chunk: {content}")
 
-        response = response.strip()
+        response = "".join(chunks).strip()
         logger.info(f"Domain identification completed: '{response}'")
         return str(response)
 
@@ -1,18 +1,13 @@
-import os
 import random
 import logging
 import re
-from groq import Groq
-from dotenv import load_dotenv
-import json
 from datetime import datetime
+from llm import chat, achat, parse_json_reply
+from storage import save_hr_result
 
 #--------- Logging ----------
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
 #----- Generate 5 random HR questions -----
 def generate_hr_questions():
     """
@@ -26,16 +21,14 @@ def generate_hr_questions():
     )
 
     try:
-        response = client.chat.completions.create(
+        raw_text = chat(
             model="llama3-8b-8192",
             messages=[
                 {"role": "system", "content": "You are an HR professional preparing screening questions."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7
-        )
-
-        raw_text = response.choices[0].message.content.strip()
+        ).strip()
 
         # Split based on line breaks and clean prefixes like "1. ", "2) ", etc.
         questions = []
@@ -62,13 +55,7 @@ def generate_hr_questions():
 
 
 #----- Evaluate HR answer using LLM -----
-def evaluate_hr_answer(question, answer):
-    """
-    Uses LLM to evaluate the HR answer.
-    Returns a score (0-10), feedback, and confidence level.
-    """
-    logging.info(f"Evaluating answer for question: '{question}'")
-
+def _hr_evaluation_messages(question, answer):
     prompt = (
         f"You are an HR evaluator assistant.\n"
         f"Evaluate the following answer to the HR question.\n\n"
@@ -80,37 +67,114 @@ def evaluate_hr_answer(question, answer):
         f"Confidence Level: <Low, Medium, High> based on the tone of the answer.\n"
         f"Don't include anything else."
     )
+    return [
+        {"role": "system", "content": "You are an expert HR evaluator."},
+        {"role": "user", "content": prompt}
+    ]
+
+def _parse_hr_evaluation(result):
+    result = result.strip()
+    logging.debug(f"Raw evaluation result: {result}")
+
+    score_match = re.search(r"^Score:\s*(\d+)", result, re.MULTILINE)
+    feedback_match = re.search(r"^Feedback:\s*(.+)", result, re.MULTILINE)
+    confidence_match = re.search(r"^Confidence Level:\s*(Low|Medium|High)", result, re.IGNORECASE | re.MULTILINE)
+
+    score = int(score_match.group(1)) if score_match else 0
+    score = max(0, min(10, score)) 
+    feedback = feedback_match.group(1).strip() if feedback_match else "No feedback provided."
+    confidence = confidence_match.group(1).capitalize() if confidence_match else "Low"
+
+    return score, feedback, confidence
+
+def evaluate_hr_answer(question, answer):
+    """
+    Uses LLM to evaluate the HR answer.
+    Returns a score (0-10), feedback, and confidence level.
+    """
+    logging.info(f"Evaluating answer for question: '{question}'")
 
     try:
-        response = client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=[
-                {"role": "system", "content": "You are an expert HR evaluator."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        result = response.choices[0].message.content.strip()
-        logging.debug(f"Raw evaluation result: {result}")
+        result = chat(model="llama3-70b-8192", messages=_hr_evaluation_messages(question, answer))
+        return _parse_hr_evaluation(result)
 
-        score_match = re.search(r"^Score:\s*(\d+)", result, re.MULTILINE)
-        feedback_match = re.search(r"^Feedback:\s*(.+)", result, re.MULTILINE)
-        confidence_match = re.search(r"^Confidence Level:\s*(Low|Medium|High)", result, re.IGNORECASE | re.MULTILINE)
+    except Exception as e:
+        logging.error(f"Error evaluating HR answer: {e}")
+        return 0, "Error during evaluation.", "Low"
 
-        score = int(score_match.group(1)) if score_match else 0
-        score = max(0, min(10, score)) 
-        feedback = feedback_match.group(1).strip() if feedback_match else "No feedback provided."
-        confidence = confidence_match.group(1).capitalize() if confidence_match else "Low"
+async def aevaluate_hr_answer(question, answer):
+    """Async evaluate_hr_answer() on the shared AsyncGroq client."""
+    logging.info(f"Evaluating answer for question: '{question}'")
 
-        return score, feedback, confidence
+    try:
+        result = await achat(model="llama3-70b-8192", messages=_hr_evaluation_messages(question, answer))
+        return _parse_hr_evaluation(result)
 
     except Exception as e:
         logging.error(f"Error evaluating HR answer: {e}")
         return 0, "Error during evaluation.", "Low"
 
+#----- Evaluate a whole HR round in one request -----
+def evaluate_hr_answers(qa_pairs):
+    """
+    Scores a list of (question, answer) pairs with a single LLM request.
+    Returns one (score, feedback, confidence) per pair, in order; pairs missing
+    from or malformed in the batch reply are evaluated one by one instead.
+    """
+    if not qa_pairs:
+        return []
+    logging.info(f"Batch-evaluating {len(qa_pairs)} HR answers")
+
+    answers_block = "\n\n".join(
+        f"{i}. Question: {question}\n   Answer: {answer}"
+        for i, (question, answer) in enumerate(qa_pairs, 1)
+    )
+    prompt = (
+        f"You are an HR evaluator assistant.\n"
+        f"Evaluate each numbered answer to its HR question.\n\n"
+        f"{answers_block}\n\n"
+        f"Return only JSON in this format:\n"
+        f'{{"evaluations": [{{"index": <number>, "score": <0-10>, '
+        f'"feedback": "<feedback on structure, clarity, and content>", '
+        f'"confidence": "<Low, Medium or High based on the tone of the answer>"}}]}}'
+    )
+
+    parsed = {}
+    try:
+        result = chat(
+            model="llama3-70b-8192",
+            messages=[
+                {"role": "system", "content": "You are an expert HR evaluator."},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"}
+        )
+        for item in parse_json_reply(result).get("evaluations", []):
+            try:
+                index = int(item["index"])
+                score = max(0, min(10, int(item["score"])))
+                feedback = str(item["feedback"]).strip() or "No feedback provided."
+                confidence = str(item.get("confidence", "Low")).capitalize()
+            except (KeyError, TypeError, ValueError):
+                continue
+            if confidence not in ("Low", "Medium", "High"):
+                confidence = "Low"
+            parsed[index] = (score, feedback, confidence)
+    except Exception as e:
+        logging.error(f"Batch HR evaluation failed, falling back to per-answer calls: {e}")
+
+    missing = [i for i in range(1, len(qa_pairs) + 1) if i not in parsed]
+    if missing:
+        logging.warning(f"Batch HR evaluation missed {len(missing)} answer(s); evaluating them individually")
+    return [
+        parsed[i] if i in parsed else evaluate_hr_answer(question, answer)
+        for i, (question, answer) in enumerate(qa_pairs, 1)
+    ]
+
 #----- Store HR result in JSON file -----
 def store_hr_result_to_json(question, answer, score, feedback, domain, candidate_id="default_user"):
     """
-    Stores the HR evaluation result to a JSON file for dashboard use.
+    Stores the HR evaluation result through the storage module for dashboard use.
     """
     data = {
         "timestamp": datetime.now().isoformat(),
@@ -122,20 +186,8 @@ def store_hr_result_to_json(question, answer, score, feedback, domain, candidate
         "feedback": feedback
     }
 
-    filename = "hr_results.json"
-
     try:
-        if os.path.exists(filename):
-            with open(filename, "r") as f:
-                results = json.load(f)
-        else:
-            results = []
-
-        results.append(data)
-
-        with open(filename, "w") as f:
-            json.dump(results, f, indent=4)
-
+        save_hr_result(candidate_id, data)
         logging.info(f"Stored HR evaluation result for candidate '{candidate_id}'.")
 
     except Exception as e:
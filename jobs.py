@@ -0,0 +1,102 @@
+import os
+import uuid
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job:
+    """A unit of background work; status/result are filled in by the worker."""
+
+    def __init__(self, session_id, fn, args, kwargs, meta=None):
+        self.id = uuid.uuid4().hex[:8]
+        self.session_id = session_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.meta = meta or {}
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def _run(self):
+        self.status = RUNNING
+        try:
+            self.result = self.fn(*self.args, **self.kwargs)
+            self.status = DONE
+        except Exception as e:
+            logging.error(f"Job {self.id} ({self.meta}) failed: {e}")
+            self.error = str(e)
+            self.status = FAILED
+        finally:
+            self.finished_at = datetime.now()
+            self._done.set()
+
+
+class JobQueue:
+    """
+    Worker pool shared by all sessions.
+
+    Jobs of one session run strictly one after another in submission order,
+    while jobs of different sessions run in parallel on the pool.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._queues = {}      # session_id -> deque of jobs waiting for their turn
+        self._active = set()   # sessions with a job on the pool
+
+    def submit(self, session_id, fn, *args, meta=None, **kwargs):
+        job = Job(session_id, fn, args, kwargs, meta)
+        with self._lock:
+            self._queues.setdefault(session_id, deque()).append(job)
+            if session_id not in self._active:
+                self._start_next(session_id)
+        return job
+
+    def _start_next(self, session_id):
+        # Caller holds self._lock
+        queue = self._queues.get(session_id)
+        if not queue:
+            self._active.discard(session_id)
+            self._queues.pop(session_id, None)
+            return
+        self._active.add(session_id)
+        job = queue.popleft()
+        self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            job._run()
+        finally:
+            with self._lock:
+                self._start_next(job.session_id)
+
+    def pending(self, session_id):
+        """Number of jobs of a session that have not finished yet."""
+        with self._lock:
+            queued = len(self._queues.get(session_id, ()))
+            return queued + (1 if session_id in self._active else 0)
+
+
+job_queue = JobQueue()
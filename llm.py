@@ -0,0 +1,166 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+
+import httpx
+from groq import Groq, AsyncGroq
+from dotenv import load_dotenv
+
+import llm_scheduler as scheduler
+from llm_cache import cache_key, response_cache
+
+load_dotenv()
+
+#----logging setup----------
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+#---------configuration---------------
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60))              # seconds per request (read/write/pool)
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", 120))
+
+TIMEOUT = httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+LIMITS = httpx.Limits(
+    max_connections=LLM_MAX_CONNECTIONS,
+    max_keepalive_connections=LLM_MAX_CONNECTIONS,
+    keepalive_expiry=LLM_KEEPALIVE_SECONDS,
+)
+
+#---------shared clients---------------
+# One pooled keep-alive connection set per process, so every request after the
+# first reuses an open TLS connection instead of building a client and handshaking.
+try:
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
+        raise ValueError("GROQ_API_KEY is not set in the environment variables.")
+    # Retries are done by llm_scheduler, which knows about rate limits and deadlines
+    client = Groq(
+        api_key=groq_api_key,
+        max_retries=0,
+        timeout=TIMEOUT,
+        http_client=httpx.Client(timeout=TIMEOUT, limits=LIMITS),
+    )
+    # httpx.AsyncClient binds its connections to the event loop that first uses
+    # them; async_client is only driven from the loop behind run_async().
+    async_client = AsyncGroq(
+        api_key=groq_api_key,
+        max_retries=0,
+        timeout=TIMEOUT,
+        http_client=httpx.AsyncClient(timeout=TIMEOUT, limits=LIMITS),
+    )
+    logger.info("Groq clients initialized successfully.")
+except Exception as e:
+    logger.error(f"[Initialization Error] Failed to create Groq client: {e}")
+    client = None
+    async_client = None
+
+
+#---------shared event loop---------------
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _event_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-async", daemon=True).start()
+    return _loop
+
+
+def run_async(coro):
+    """Schedule a coroutine on the process-wide LLM event loop; returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, _event_loop())
+
+
+def _require(llm_client):
+    if llm_client is None:
+        raise RuntimeError("Groq client is not initialized.")
+    return llm_client
+
+
+#---------calls---------------
+# Pass cache_ttl (seconds) to opt a call into the response cache: a repeated
+# prompt/model/params within the TTL is answered without a network round-trip.
+# Every request goes through llm_scheduler: priority is "interactive",
+# "background" or "extras" (default: the llm_scheduler.priority() block, else
+# interactive) and deadline is the seconds the call may take including retries.
+
+def _cached(messages, model, params, cache_ttl):
+    if not cache_ttl:
+        return None, None
+    key = cache_key(messages, model, params)
+    return key, response_cache.get(key)
+
+
+def chat(messages, model, cache_ttl=None, priority=None, deadline=None, **params):
+    """Run a chat completion on the shared client and return the reply text."""
+    key, cached = _cached(messages, model, params, cache_ttl)
+    if cached is not None:
+        return cached
+    response = scheduler.call(
+        lambda timeout: _require(client).chat.completions.create(
+            model=model, messages=messages, timeout=timeout, **params),
+        messages, params, priority, deadline, label=f"{model} completion", model=model
+    )
+    reply = response.choices[0].message.content
+    if key:
+        response_cache.put(key, reply, cache_ttl, model)
+    return reply
+
+
+async def achat(messages, model, cache_ttl=None, priority=None, deadline=None, **params):
+    """
+    Async chat() on the shared AsyncGroq client.
+
+    Coroutines run on the event loop thread, which does not see the caller's
+    llm_scheduler.priority() block; pass priority explicitly.
+    """
+    key, cached = _cached(messages, model, params, cache_ttl)
+    if cached is not None:
+        return cached
+    response = await scheduler.acall(
+        lambda timeout: _require(async_client).chat.completions.create(
+            model=model, messages=messages, timeout=timeout, **params),
+        messages, params, priority, deadline, label=f"{model} completion", model=model
+    )
+    reply = response.choices[0].message.content
+    if key:
+        response_cache.put(key, reply, cache_ttl, model)
+    return reply
+
+
+def parse_json_reply(reply):
+    """Decode a JSON object from a model reply, tolerating code fences or text around it."""
+    start, end = reply.find("{"), reply.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("No JSON object in model reply")
+    return json.loads(reply[start:end + 1])
+
+
+def stream_chat(messages, model, cache_ttl=None, priority=None, deadline=None, **params):
+    """Yield the reply text chunk by chunk as the model produces it."""
+    key, cached = _cached(messages, model, params, cache_ttl)
+    if cached is not None:
+        yield cached
+        return
+    # Opening the stream is retried; once tokens are flowing an error is final
+    stream = scheduler.call(
+        lambda timeout: _require(client).chat.completions.create(
+            model=model, messages=messages, stream=True, timeout=timeout, **params),
+        messages, params, priority, deadline, label=f"{model} stream", model=model
+    )
+    chunks = []
+    for chunk in stream:
+        content = chunk.choices[0].delta.content
+        if content:
+            chunks.append(content)
+            yield content
+    # Only a stream read to the end is cached
+    if key:
+        response_cache.put(key, "".join(chunks), cache_ttl, model)
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "llm_cache.db")   # empty: memory tier only
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 512))
+LLM_CACHE_PURGE_EVERY = int(os.getenv("LLM_CACHE_PURGE_EVERY", 200))   # puts between deletes of expired rows
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_expires ON responses (expires_at);
+"""
+
+
+def normalize_messages(messages):
+    """Messages with whitespace collapsed, so re-indented or re-wrapped prompts share a key."""
+    return [
+        {"role": message["role"], "content": re.sub(r"\s+", " ", str(message.get("content", ""))).strip()}
+        for message in messages
+    ]
+
+
+def cache_key(messages, model, params):
+    payload = json.dumps(
+        {"model": model, "messages": normalize_messages(messages), "params": params},
+        sort_keys=True, default=str,
+    )
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """
+    LLM replies keyed by cache_key(), each with its own expiry time.
+
+    The memory tier keeps the max_entries most recently used replies; the
+    SQLite tier (WAL, one connection per thread) is shared by every worker
+    process using the same db_path; expired rows are deleted every
+    LLM_CACHE_PURGE_EVERY puts.
+    """
+
+    def __init__(self, db_path=LLM_CACHE_DB, max_entries=LLM_CACHE_SIZE):
+        self.db_path = db_path or None
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (value, expires_at)
+        self.puts = 0
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key, value, expires_at):
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is not None:
+                if cached[1] > now:
+                    self.entries.move_to_end(key)
+                    return cached[0]
+                del self.entries[key]
+        if not self.db_path:
+            return None
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"LLM cache lookup failed: {e}")
+            return None
+        if row is None:
+            return None
+        self._remember(key, row[0], row[1])
+        return row[0]
+
+    def put(self, key, value, ttl, model=None):
+        expires_at = time.time() + ttl
+        self._remember(key, value, expires_at)
+        if not self.db_path:
+            return
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, model, value, expires_at),
+                )
+        except sqlite3.Error as e:
+            logging.warning(f"LLM cache write failed: {e}")
+            return
+        with self.lock:
+            self.puts += 1
+            purge = self.puts % LLM_CACHE_PURGE_EVERY == 0
+        if purge:
+            try:
+                removed = self.purge_expired()
+                logging.info(f"LLM cache: purged {removed} expired rows")
+            except sqlite3.Error as e:
+                logging.warning(f"LLM cache purge failed: {e}")
+
+    def purge_expired(self):
+        """Delete expired rows from the SQLite tier; returns how many were removed."""
+        if not self.db_path:
+            return 0
+        conn = self._connection()
+        with conn:
+            return conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+response_cache = ResponseCache()
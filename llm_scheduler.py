@@ -0,0 +1,270 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import logging
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+import groq
+
+#---------configuration---------------
+# Groq meters each model separately, so every model gets its own buckets
+LLM_RPM = float(os.getenv("LLM_RPM", 30))        # requests per minute allowed per model
+LLM_TPM = float(os.getenv("LLM_TPM", 12000))     # tokens (prompt + completion) per minute per model
+# Per-model overrides, e.g. "llama3-8b-8192=30:30000,llama3-70b-8192=30:12000" (model=rpm:tpm)
+LLM_MODEL_LIMITS = os.getenv("LLM_MODEL_LIMITS", "")
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 1.0))   # seconds
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 30.0))
+DEFAULT_COMPLETION_TOKENS = 512
+
+# Lower value = served first when callers are waiting for capacity
+INTERACTIVE = 0   # answer evaluation, domain identification, chatbot replies
+BACKGROUND = 1    # question-bank refills, chat summaries
+EXTRAS = 2        # dashboard recommendations
+
+PRIORITIES = {"interactive": INTERACTIVE, "background": BACKGROUND, "extras": EXTRAS}
+DEADLINES = {   # seconds from submission until a call gives up, per priority
+    INTERACTIVE: float(os.getenv("LLM_DEADLINE_INTERACTIVE", 60)),
+    BACKGROUND: float(os.getenv("LLM_DEADLINE_BACKGROUND", 300)),
+    EXTRAS: float(os.getenv("LLM_DEADLINE_EXTRAS", 90)),
+}
+
+RETRYABLE = (groq.RateLimitError, groq.APIConnectionError, groq.APITimeoutError, groq.InternalServerError)
+
+_current_priority = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+
+class DeadlineExceeded(TimeoutError):
+    """An LLM call could not be sent or completed before its deadline."""
+
+
+@contextmanager
+def priority(level):
+    """Run the LLM calls in this block at the given priority ("interactive", "background", "extras")."""
+    token = _current_priority.set(PRIORITIES.get(level, level))
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def resolve_priority(level=None):
+    if level is None:
+        return _current_priority.get()
+    return PRIORITIES.get(level, level)
+
+
+def estimate_tokens(messages, params):
+    """Rough request cost for the token bucket: ~4 characters per prompt token plus the completion cap."""
+    prompt = sum(len(str(message.get("content", ""))) for message in messages) // 4
+    return prompt + int(params.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+class RateLimiter:
+    """
+    Token buckets for requests and tokens per minute of one model, shared by
+    every thread and the LLM event loop (see limiter_for()).
+
+    Callers queue by (priority, arrival); only the head of the queue may take
+    capacity, so a waiting interactive call is always served before queued
+    background work.
+    """
+
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = rpm
+        self.tokens = tpm
+        self.updated = time.monotonic()
+        self.cond = threading.Condition()
+        self.waiters = []             # heap of (priority, seq)
+        self.seq = itertools.count()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed, self.updated = now - self.updated, now
+        self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+
+    def _try_take(self, ticket, cost):
+        """Caller holds self.cond. Returns 0 when capacity was taken, else seconds to wait."""
+        if self.waiters[0] != ticket:
+            return None   # not our turn; wait to be notified
+        self._refill()
+        cost = min(cost, self.tpm)   # a prompt bigger than a minute's budget waits for a full bucket
+        wait = max((1 - self.requests) * 60 / self.rpm, (cost - self.tokens) * 60 / self.tpm, 0)
+        if wait > 0:
+            return wait
+        self.requests -= 1
+        self.tokens -= cost
+        heapq.heappop(self.waiters)
+        self.cond.notify_all()
+        return 0
+
+    def _enqueue(self, level):
+        ticket = (level, next(self.seq))
+        heapq.heappush(self.waiters, ticket)
+        return ticket
+
+    def _abandon(self, ticket):
+        # Caller holds self.cond; a no-op once the ticket has taken capacity
+        if ticket in self.waiters:
+            self.waiters.remove(ticket)
+            heapq.heapify(self.waiters)
+            self.cond.notify_all()
+
+    def acquire(self, cost, level, deadline):
+        with self.cond:
+            ticket = self._enqueue(level)
+            try:
+                while True:
+                    wait = self._try_take(ticket, cost)
+                    if wait == 0:
+                        return
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise DeadlineExceeded("LLM rate limit: no capacity before the call's deadline")
+                    self.cond.wait(min(remaining, wait if wait is not None else remaining))
+            finally:
+                # A waiter that gives up for any reason must not block the queue behind it
+                self._abandon(ticket)
+
+    async def acquire_async(self, cost, level, deadline):
+        # The event loop must not block on the condition; poll with asyncio.sleep instead
+        with self.cond:
+            ticket = self._enqueue(level)
+        try:
+            while True:
+                with self.cond:
+                    wait = self._try_take(ticket, cost)
+                    if wait == 0:
+                        return
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise DeadlineExceeded("LLM rate limit: no capacity before the call's deadline")
+                await asyncio.sleep(min(remaining, wait if wait is not None else 0.05))
+        finally:
+            # Also on cancellation, e.g. a dashboard task dropped on rerun
+            with self.cond:
+                self._abandon(ticket)
+
+    def settle(self, estimated, actual):
+        """Correct the token bucket once the provider reports real usage."""
+        if actual is None:
+            return
+        with self.cond:
+            self.tokens = min(self.tpm, self.tokens + estimated - actual)
+
+    def pause(self, seconds):
+        """Empty the request bucket after a 429 so no one else hammers the provider meanwhile."""
+        with self.cond:
+            self._refill()
+            self.requests = min(self.requests, -seconds * self.rpm / 60 + 1)
+
+
+def parse_model_limits(spec):
+    """{model: (rpm, tpm)} from a "model=rpm:tpm,..." string."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, values = item.partition("=")
+        rpm, _, tpm = values.partition(":")
+        limits[model.strip()] = (float(rpm), float(tpm))
+    return limits
+
+
+MODEL_LIMITS = parse_model_limits(LLM_MODEL_LIMITS)
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(model):
+    """The RateLimiter for one model, created on first use."""
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limiter = _limiters[model] = RateLimiter(*MODEL_LIMITS.get(model, (LLM_RPM, LLM_TPM)))
+        return limiter
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, error=None):
+    """Full-jitter exponential backoff, at least the provider's Retry-After when it sends one."""
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+    retry_after = _retry_after(error) if error is not None else None
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def _next_attempt(limiter, error, attempt, deadline, label):
+    """Seconds to sleep before retrying, or re-raise if the error is final."""
+    if not isinstance(error, RETRYABLE) or attempt >= LLM_MAX_RETRIES:
+        raise error
+    delay = backoff_delay(attempt, error)
+    if time.monotonic() + delay >= deadline:
+        raise DeadlineExceeded(f"{label}: deadline reached while retrying ({error})") from error
+    if isinstance(error, groq.RateLimitError):
+        limiter.pause(delay)
+    logging.warning(f"{label} failed ({type(error).__name__}), retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+    return delay
+
+
+def _remaining(deadline):
+    return max(deadline - time.monotonic(), 0.1)
+
+
+def call(send, messages, params, level=None, deadline=None, label="LLM call", model=None):
+    """
+    Run send(timeout) under the model's rate limiter with retries.
+
+    send makes one request and returns the response; it is given the seconds
+    left before the deadline to use as its request timeout.
+    """
+    level = resolve_priority(level)
+    deadline = time.monotonic() + (deadline or DEADLINES.get(level, DEADLINES[INTERACTIVE]))
+    cost = estimate_tokens(messages, params)
+    limiter = limiter_for(model)
+    attempt = 0
+    while True:
+        limiter.acquire(cost, level, deadline)
+        try:
+            response = send(_remaining(deadline))
+        except Exception as e:
+            time.sleep(_next_attempt(limiter, e, attempt, deadline, label))
+            attempt += 1
+            continue
+        usage = getattr(response, "usage", None)
+        limiter.settle(cost, getattr(usage, "total_tokens", None))
+        return response
+
+
+async def acall(send, messages, params, level=None, deadline=None, label="LLM call", model=None):
+    """Async call(): send(timeout) returns an awaitable response."""
+    level = resolve_priority(level)
+    deadline = time.monotonic() + (deadline or DEADLINES.get(level, DEADLINES[INTERACTIVE]))
+    cost = estimate_tokens(messages, params)
+    limiter = limiter_for(model)
+    attempt = 0
+    while True:
+        await limiter.acquire_async(cost, level, deadline)
+        try:
+            response = await send(_remaining(deadline))
+        except Exception as e:
+            await asyncio.sleep(_next_attempt(limiter, e, attempt, deadline, label))
+            attempt += 1
+            continue
+        usage = getattr(response, "usage", None)
+        limiter.settle(cost, getattr(usage, "total_tokens", None))
+        return response
@@ -1,19 +1,64 @@
 import streamlit as st
 from streamlit_chat import message
 from voice import VoiceRecorder
+from speech_models import warm_up_from_env
 from domain import identify_domain, client
-from hr import generate_hr_questions, evaluate_hr_answer
-from technical import generate_technical_questions, evaluate_technical_answer
-from storage import save_hr_result, load_hr_results, save_tech_result, load_tech_results
+from hr import aevaluate_hr_answer, evaluate_hr_answers
+from technical import aevaluate_technical_answer, evaluate_technical_answers
+from llm import run_async
+from question_bank import question_bank
+from storage import ResultBuffer
+from jobs import job_queue, DONE
 from dashboard import show_dashboard
 from chatbot import chatbot_page
+from concurrent import futures
+import os
+import time
 import uuid
 
+# "immediate": score each answer as it comes in; "deferred": score a whole round in one request at its end
+DEFERRED_SCORING = os.getenv("SCORING_MODE", "immediate") == "deferred"
+
 st.set_page_config(page_title="Mock Interview Bot", layout="centered")
 
+@st.cache_resource
+def warm_up_speech_models():
+    """Runs once per server process; loads WHISPER_WARMUP models and tops up HR questions in the background"""
+    warm_up_from_env()
+    question_bank.prefetch_hr()
+    return True
+
+warm_up_speech_models()
+
 def generate_candidate_id():
     return f"cand-{uuid.uuid4().hex[:6]}"
 
+async def evaluate_answer(round_name, question, transcript, domain):
+    """Score one answer on the shared LLM event loop; returns (score, feedback)"""
+    if round_name == "hr":
+        score, feedback, confidence = await aevaluate_hr_answer(question, transcript)
+        return score, feedback
+    return await aevaluate_technical_answer(question, transcript, domain)
+
+def process_answer(transcribe, round_name, question, domain, evaluate=True):
+    """Background job: transcribe a recorded answer and (unless scoring is deferred) start scoring it"""
+    transcription = transcribe()
+    transcript = transcription['text']
+    if not transcript:
+        return {"transcript": "", "error": transcription.get('error')}
+    if not evaluate:
+        return {"transcript": transcript}
+    # Scoring waits on the network, not the CPU: run it on the event loop so this
+    # worker can move on to transcribing the next answer
+    evaluation = run_async(evaluate_answer(round_name, question, transcript, domain))
+    return {"transcript": transcript, "evaluation": evaluation}
+
+def score_round(round_name, qa_pairs, domain):
+    """Background job: score a round's (question, answer) pairs in one batched request"""
+    if round_name == "hr":
+        return [(score, feedback) for score, feedback, confidence in evaluate_hr_answers(qa_pairs)]
+    return evaluate_technical_answers(qa_pairs, domain)
+
 def initialize_session_state():
     keys_with_defaults = {
         "candidate_id": generate_candidate_id(),
@@ -31,8 +76,11 @@ def initialize_session_state():
         "recording_duration": 20,
         "hr_answers": [],
         "tech_answers": [],
+        "answer_jobs": [],
+        "evaluations": [],
+        "unscored": [],
         "page": "interview",
-        "voice_recorder": VoiceRecorder(model_size="base"),
+        "voice_recorder": VoiceRecorder(model_size="base", streaming=True, auto_stop_silence=8.0),
         "id_verified": False,
         "id_prompt_shown": False,
         "result_shown": False
@@ -40,6 +88,8 @@ def initialize_session_state():
     for key, default in keys_with_defaults.items():
         if key not in st.session_state:
             st.session_state[key] = default
+    if "result_buffer" not in st.session_state:
+        st.session_state.result_buffer = ResultBuffer(st.session_state.candidate_id)
 
 def main():
     initialize_session_state() 
@@ -63,7 +113,7 @@ def main():
             'tech_answers': [],
             'candidate_id': generate_candidate_id(),
             'page': "interview",
-            'voice_recorder': VoiceRecorder(model_size="base")
+            'voice_recorder': VoiceRecorder(model_size="base", streaming=True, auto_stop_silence=8.0)
         })
 
     # Display candidate ID
@@ -77,6 +127,201 @@ def main():
     def add_message(msg, is_user):
         st.session_state.chat_history.append({'msg': msg, 'user': is_user})
 
+    ROUNDS = {
+        "hr": ("hr_qns", "hr_index", "hr_answers", "HR Q"),
+        "tech": ("tech_qns", "tech_index", "tech_answers", "Tech Q"),
+    }
+
+    def submit_answer(round_name, question_index, question, audio_data):
+        """Queue transcription + evaluation so the next question can be shown right away"""
+        recorder = st.session_state.voice_recorder
+        job = job_queue.submit(
+            st.session_state.candidate_id, process_answer,
+            recorder.transcription_job(audio_data), round_name, question, st.session_state.domain,
+            evaluate=not DEFERRED_SCORING,
+            meta={"round": round_name, "index": question_index, "question": question}
+        )
+        st.session_state.chat_history.append({'msg': "⏳ Processing your answer...", 'user': True, 'job': job.id})
+        st.session_state.answer_jobs.append(job)
+
+    def save_score(round_name, index, answer):
+        st.session_state.result_buffer.add(round_name, index, {
+            "domain": st.session_state.domain,
+            **answer
+        })
+
+    def apply_round_scores(job):
+        round_name = job.meta["round"]
+        answers = st.session_state[ROUNDS[round_name][2]]
+        pending = [item for item in st.session_state.unscored if item[0] == round_name]
+        scores = job.result if job.status == DONE else []
+        for n, (_, index, pos) in enumerate(pending):
+            score, feedback = scores[n] if n < len(scores) else (0, "Error during evaluation.")
+            answer = answers[pos]
+            answer.update(score=score, feedback=feedback)
+            add_message(f"✅ Feedback on \"{answer['question']}\": {feedback} (Score: {score}/10)", False)
+            save_score(round_name, index, answer)
+        st.session_state.unscored = [item for item in st.session_state.unscored if item[0] != round_name]
+
+    def round_scored(round_name):
+        """In deferred mode, queue one batched scoring job for the round; True once nothing is left to score"""
+        pending = [item for item in st.session_state.unscored if item[0] == round_name]
+        if not pending:
+            return True
+        answers = st.session_state[ROUNDS[round_name][2]]
+        qa_pairs = [(answers[pos]["question"], answers[pos]["answer"]) for _, _, pos in pending]
+        job = job_queue.submit(
+            st.session_state.candidate_id, score_round, round_name, qa_pairs, st.session_state.domain,
+            meta={"round": round_name, "scoring": True}
+        )
+        st.session_state.answer_jobs.append(job)
+        add_message("📝 Scoring your answers for this round...", False)
+        return False
+
+    def apply_evaluation(evaluation):
+        round_name = evaluation["round"]
+        try:
+            score, feedback = evaluation["future"].result()
+        except Exception:
+            score, feedback = 0, "Error during evaluation."
+        answer = st.session_state[ROUNDS[round_name][2]][evaluation["pos"]]
+        answer.update(score=score, feedback=feedback)
+        # Feedback goes right under the transcript it belongs to
+        history = st.session_state.chat_history
+        pos = next((i for i, chat in enumerate(history) if chat.get('eval') == evaluation["id"]), len(history) - 1)
+        history.insert(pos + 1, {'msg': f"✅ Feedback: {feedback} (Score: {score}/10)", 'user': False})
+        save_score(round_name, evaluation["index"], answer)
+
+    def answers_pending():
+        return len(st.session_state.answer_jobs) + len(st.session_state.evaluations)
+
+    def wait_for_answers(timeout=120):
+        """Block until every submitted answer is transcribed and scored, or timeout seconds in total pass"""
+        deadline = time.monotonic() + timeout
+        while answers_pending():
+            for job in st.session_state.answer_jobs:
+                job.wait(max(deadline - time.monotonic(), 0))
+            futures.wait([evaluation["future"] for evaluation in st.session_state.evaluations],
+                         max(deadline - time.monotonic(), 0))
+            if not apply_finished_jobs():
+                break
+
+    def give_up_on_answers():
+        """Record whatever is still pending as failed, so it is saved before the result buffer closes"""
+        for evaluation in st.session_state.evaluations:
+            evaluation["future"].cancel()
+            answer = st.session_state[ROUNDS[evaluation["round"]][2]][evaluation["pos"]]
+            answer.update(score=0, feedback="Error during evaluation.")
+            save_score(evaluation["round"], evaluation["index"], answer)
+        st.session_state.evaluations = []
+
+        untranscribed = 0
+        for job in st.session_state.answer_jobs:
+            if job.meta.get("scoring"):
+                # Unless it finished meanwhile, every answer of the round is marked as failed
+                apply_round_scores(job)
+            else:
+                untranscribed += 1
+        st.session_state.answer_jobs = []
+        if untranscribed:
+            add_message(f"❌ {untranscribed} answer(s) could not be processed in time and are not included.", False)
+
+    def apply_finished_jobs():
+        """Move finished answers and evaluations into the chat and the result buffer; returns True if anything changed"""
+        changed = False
+        for job in list(st.session_state.answer_jobs):
+            if not job.finished:
+                break  # keep answers in submission order
+            st.session_state.answer_jobs.remove(job)
+            changed = True
+
+            if job.meta.get("scoring"):
+                apply_round_scores(job)
+                continue
+
+            round_name, index, question = job.meta["round"], job.meta["index"], job.meta["question"]
+            qns_key, index_key, answers_key, label = ROUNDS[round_name]
+            history = st.session_state.chat_history
+            pos = next((i for i, chat in enumerate(history) if chat.get('job') == job.id), len(history) - 1)
+            result = job.result or {}
+
+            if job.status == DONE and result.get("transcript"):
+                history[pos] = {'msg': result["transcript"], 'user': True, 'eval': job.id}
+                st.session_state[answers_key].append({
+                    "question": question,
+                    "answer": result["transcript"],
+                    "score": None,
+                    "feedback": None
+                })
+                answer_pos = len(st.session_state[answers_key]) - 1
+                if "evaluation" in result:
+                    st.session_state.evaluations.append({
+                        "future": result["evaluation"], "id": job.id,
+                        "round": round_name, "index": index, "pos": answer_pos
+                    })
+                else:
+                    # Deferred scoring: scored with the rest of the round
+                    st.session_state.unscored.append((round_name, index, answer_pos))
+            else:
+                # Ask the question again at the end of the round
+                history[pos] = {'msg': "🔇 (answer not recognised)", 'user': True}
+                history.insert(pos + 1, {'msg': f"❌ Could not transcribe your answer to \"{question}\". It will be asked again.", 'user': False})
+                qns = st.session_state[qns_key]
+                qns.append(question)
+                if st.session_state[index_key] == len(qns) - 1:
+                    add_message(f"{label}{len(qns)}: {question}", False)
+
+        for evaluation in list(st.session_state.evaluations):
+            if evaluation["future"].done():
+                st.session_state.evaluations.remove(evaluation)
+                apply_evaluation(evaluation)
+                changed = True
+        return changed
+
+    @st.fragment(run_every=1.0)
+    def show_pending_answers():
+        """Polls the job queue and reruns the page when answers have been evaluated"""
+        if apply_finished_jobs():
+            st.rerun()
+        pending = answers_pending()
+        if pending:
+            st.caption(f"⏳ {pending} answer(s) being evaluated in the background...")
+
+    def record_answer(round_name):
+        """Recording controls for the current question; returns False once the round's questions are used up"""
+        qns_key, index_key, answers_key, label = ROUNDS[round_name]
+        qns = st.session_state[qns_key]
+        index = st.session_state[index_key]
+        if index >= len(qns):
+            return False
+        question = qns[index]
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            if st.button("🎙️ Start Recording"):
+                st.session_state.voice_recorder.start_recording()
+                st.session_state.recording = True
+                st.success("Recording started - speak now!")
+
+        with col2:
+            if st.button("⏹️ Stop & Submit"):
+                if st.session_state.recording:
+                    audio_data = st.session_state.voice_recorder.stop_recording()
+                    st.session_state.recording = False
+
+                    if audio_data is not None:
+                        submit_answer(round_name, index, question, audio_data)
+                        st.session_state[index_key] += 1
+                        if st.session_state[index_key] < len(qns):
+                            add_message(f"{label}{st.session_state[index_key] + 1}: {qns[st.session_state[index_key]]}", False)
+                        st.rerun()
+                    else:
+                        st.error("No audio recorded. Please try again.")
+        return True
+
+    apply_finished_jobs()
+
     # Interview stages
     if st.session_state.stage == 'start':
         display_chat()
@@ -116,6 +361,8 @@ def main():
             if user_input == 'yes':
                 if 'invalid_input' in st.session_state:
                     del st.session_state.invalid_input
+                # Bank technical questions for this domain while the HR round runs
+                question_bank.prefetch(st.session_state.domain)
                 st.session_state.stage = 'start_hr_prompt'
                 st.rerun()
                 
@@ -150,7 +397,7 @@ def main():
             add_message(user_input, True)
         
             if user_input == 'yes':
-                st.session_state.hr_qns = generate_hr_questions()
+                st.session_state.hr_qns = question_bank.draw_hr(st.session_state.candidate_id)
                 question = st.session_state.hr_qns[0]
                 add_message(f"HR Question 1: {question}", False)
                 st.session_state.stage = 'hr_round'
@@ -166,56 +413,13 @@ def main():
 
     elif st.session_state.stage == 'hr_round':
         display_chat()
-        
-        if st.session_state.hr_index < len(st.session_state.hr_qns):
-            question = st.session_state.hr_qns[st.session_state.hr_index]
-            # st.write(f"**HR Q{st.session_state.hr_index + 1}:** {question}")
+        show_pending_answers()
 
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                if st.button("🎙️ Start Recording"):
-                    st.session_state.voice_recorder.start_recording()
-                    st.session_state.recording = True
-                    st.success("Recording started - speak now!")
-            
-            with col2:
-                if st.button("⏹️ Stop & Submit"):
-                    if st.session_state.recording:
-                        audio_data = st.session_state.voice_recorder.stop_recording()
-                        st.session_state.recording = False
-                        
-                        if audio_data is not None:
-                            with st.spinner("Processing your answer..."):
-                                transcription = st.session_state.voice_recorder.transcribe(audio_data)
-                                transcript = transcription['text']
-                                
-                                if transcript:
-                                    score, feedback, confidence = evaluate_hr_answer(question, transcript)
-
-                                    add_message(transcript, True)
-                                    add_message(f"✅ Feedback: {feedback} (Score: {score}/10)", False)
-
-                                    st.session_state.hr_answers.append((transcript, score, feedback))
-                                    save_hr_result(st.session_state.candidate_id, {
-                                        "question": question,
-                                        "answer": transcript,
-                                        "score": score,
-                                        "feedback": feedback
-                                    })
-
-                                    st.session_state.hr_index += 1
-                                    if st.session_state.hr_index < len(st.session_state.hr_qns):
-                                        next_q = st.session_state.hr_qns[st.session_state.hr_index]
-                                        add_message(f"HR Q{st.session_state.hr_index + 1}: {next_q}", False)
-                                    else:
-                                        add_message("HR round complete! Ready for technical? Types 'Yes' to proceed", False)
-                                        st.session_state.stage = 'tech_prompt'
-                                    st.rerun()
-                                else:
-                                    st.error("Could not transcribe your answer. Please try again.")
-                        else:
-                            st.error("No audio recorded. Please try again.")
+        if not record_answer("hr") and not answers_pending() and round_scored("hr"):
+            add_message("HR round complete! Ready for technical? Types 'Yes' to proceed", False)
+            st.session_state.result_buffer.flush("hr")
+            st.session_state.stage = 'tech_prompt'
+            st.rerun()
 
     elif st.session_state.stage == 'tech_prompt':
         display_chat()
@@ -224,7 +428,7 @@ def main():
         if user_input:
             add_message(user_input, True)
             if user_input.lower() == 'yes':
-                st.session_state.tech_qns = generate_technical_questions(st.session_state.domain)
+                st.session_state.tech_qns = question_bank.draw_technical(st.session_state.domain, st.session_state.candidate_id)
                 question = st.session_state.tech_qns[0]
                 add_message(f"Tech Q1: {question}", False)
                 st.session_state.stage = 'tech_round'
@@ -238,55 +442,13 @@ def main():
 
     elif st.session_state.stage == 'tech_round':
         display_chat()
-        if st.session_state.tech_index < len(st.session_state.tech_qns):
-            question = st.session_state.tech_qns[st.session_state.tech_index]
-            # st.write(f"**Tech Q{st.session_state.tech_index + 1}:** {question}")
+        show_pending_answers()
 
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                if st.button("🎙️ Start Recording"):
-                    st.session_state.voice_recorder.start_recording()
-                    st.session_state.recording = True
-                    st.success("Recording started - speak now!")
-            
-            with col2:
-                if st.button("⏹️ Stop & Submit"):
-                    if st.session_state.recording:
-                        audio_data = st.session_state.voice_recorder.stop_recording()
-                        st.session_state.recording = False
-                        
-                        if audio_data is not None:
-                            with st.spinner("Processing your answer..."):
-                                transcription = st.session_state.voice_recorder.transcribe(audio_data)
-                                transcript = transcription['text']
-                                
-                                if transcript:
-                                    score, feedback = evaluate_technical_answer(question, transcript, st.session_state.domain)
-
-                                    add_message(transcript, True)
-                                    add_message(f"✅ Feedback: {feedback} (Score: {score}/10)", False)
-
-                                    st.session_state.tech_answers.append((transcript, score, feedback))
-                                    save_tech_result(st.session_state.candidate_id, {
-                                        "question": question,
-                                        "answer": transcript,
-                                        "score": score,
-                                        "feedback": feedback
-                                    })
-
-                                    st.session_state.tech_index += 1
-                                    if st.session_state.tech_index < len(st.session_state.tech_qns):
-                                        next_q = st.session_state.tech_qns[st.session_state.tech_index]
-                                        add_message(f"Tech Q{st.session_state.tech_index + 1}: {next_q}", False)
-                                    else:
-                                        add_message("Interview complete! Type 'show result' to view your dashboard.", False)
-                                        st.session_state.stage = 'result_wait'  # Fixed stage name
-                                    st.rerun()
-                                else:
-                                    st.error("Could not transcribe your answer. Please try again.")
-                        else:
-                            st.error("No audio recorded. Please try again.")
+        if not record_answer("tech") and not answers_pending() and round_scored("tech"):
+            add_message("Interview complete! Type 'show result' to view your dashboard.", False)
+            st.session_state.result_buffer.flush("tech")
+            st.session_state.stage = 'result_wait'  # Fixed stage name
+            st.rerun()
 
     elif st.session_state.stage == 'result_wait':
         display_chat()
@@ -317,36 +479,35 @@ def main():
                 add_message(user_input, True)
                 
                 if user_input.lower().strip() == 'show result':
+                    if answers_pending():
+                        with st.spinner("Waiting for the last evaluations..."):
+                            wait_for_answers()
+                        # Nothing may reach the result buffer after it is closed below
+                        give_up_on_answers()
+
                     # Prepare the data for dashboard
                     hr_results = [
                         {
                             "candidate_id": st.session_state.candidate_id,
                             "domain": st.session_state.domain,
-                            "question": st.session_state.hr_qns[i],
-                            "answer": ans[0],
-                            "score": ans[1],
-                            "feedback": ans[2]
+                            **ans
                         }
-                        for i, ans in enumerate(st.session_state.hr_answers)
+                        for ans in st.session_state.hr_answers
                     ]
                     
                     tech_results = [
                         {
                             "candidate_id": st.session_state.candidate_id,
                             "domain": st.session_state.domain,
-                            "question": st.session_state.tech_qns[i],
-                            "answer": ans[0],
-                            "score": ans[1],
-                            "feedback": ans[2]
+                            **ans
                         }
-                        for i, ans in enumerate(st.session_state.tech_answers)
+                        for ans in st.session_state.tech_answers
                     ]
                     
-                    # Save to session state and storage
+                    # Answers were already saved per round; write out anything still buffered
                     st.session_state.hr_data = hr_results
                     st.session_state.tech_data = tech_results
-                    save_hr_result(st.session_state.candidate_id, hr_results)
-                    save_tech_result(st.session_state.candidate_id, tech_results)
+                    st.session_state.result_buffer.close()
                     
                     # Mark results as shown and proceed to dashboard
                     st.session_state.result_shown = True
@@ -378,6 +539,7 @@ def main():
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("🔁 Start New Interview"):
+                    st.session_state.result_buffer.close()
                     for key in list(st.session_state.keys()):
                         del st.session_state[key]
                     st.session_state.stage = 'start'
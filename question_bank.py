@@ -0,0 +1,199 @@
+import os
+import re
+import json
+import random
+import logging
+import threading
+from collections import OrderedDict, deque
+
+from hr import generate_hr_questions
+from technical import generate_technical_questions
+from storage import file_lock, load_json, save_json
+from llm_scheduler import priority
+
+QUESTION_BANK_FILE = os.getenv("QUESTION_BANK_FILE", "question_bank.json")
+HR_ROUND_SIZE = 5
+TECH_ROUND_SIZE = 10
+# Refill a domain once fewer than this many rounds' worth of questions are banked
+BANK_LOW_WATER_ROUNDS = int(os.getenv("BANK_LOW_WATER_ROUNDS", 3))
+BANK_TARGET_ROUNDS = int(os.getenv("BANK_TARGET_ROUNDS", 4))
+MAX_REFILL_CALLS = 6          # LLM calls per refill, in case the model keeps repeating itself
+MAX_TRACKED_CANDIDATES = 1000
+
+HR_KEY = "__hr__"
+# What the generators return instead of questions when the LLM call fails
+FAILED_PREFIXES = ("Failed to generate questions", "Error generating questions")
+
+
+def normalize_domain(domain):
+    """Bank key for a domain: lower-case words without punctuation."""
+    return " ".join(re.sub(r"[^a-z0-9+#]+", " ", (domain or "").lower()).split())
+
+
+def _question_key(question):
+    return " ".join(question.lower().split())
+
+
+class QuestionBank:
+    """
+    Pre-generated questions per domain, persisted in QUESTION_BANK_FILE.
+
+    Rounds draw from the bank without calling the LLM; questions already
+    served to a candidate are not drawn for them again. A background thread
+    tops up domains that run low, and an unseen domain only costs a
+    synchronous LLM call if nothing was prefetched for it in time.
+    """
+
+    def __init__(self, path=QUESTION_BANK_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()    # one writer of the bank file per process
+        self.questions = {key: list(value) for key, value in self._read_file().items()}
+        self.served = OrderedDict()    # candidate_id -> set of question keys already asked
+        self.refills = deque()
+        self.pending = set()           # bank keys queued or being refilled
+        self.wakeup = threading.Condition(self.lock)
+        self._thread = None
+
+    # ---------- drawing ----------
+
+    def draw_hr(self, candidate_id, count=HR_ROUND_SIZE):
+        return self._draw(HR_KEY, None, candidate_id, count)
+
+    def draw_technical(self, domain, candidate_id, count=TECH_ROUND_SIZE):
+        return self._draw(normalize_domain(domain), domain, candidate_id, count)
+
+    def _draw(self, key, domain, candidate_id, count):
+        with self.lock:
+            fresh = self._unseen(key, candidate_id)
+        if len(fresh) < count:
+            # Not enough banked (e.g. a brand-new domain): generate on the critical path once
+            logging.info(f"Question bank short for '{key}' ({len(fresh)}/{count}); generating now")
+            generated = self._generator(key, domain)
+            self._add(key, self._usable(generated))
+            with self.lock:
+                fresh = self._unseen(key, candidate_id) or list(self.questions.get(key, []))
+            if not fresh:
+                # Nothing banked and generation failed: pass the generator's own reply through
+                return generated
+
+        chosen = random.sample(fresh, min(count, len(fresh)))
+        with self.lock:
+            seen = self.served.setdefault(candidate_id, set())
+            self.served.move_to_end(candidate_id)
+            seen.update(_question_key(question) for question in chosen)
+            while len(self.served) > MAX_TRACKED_CANDIDATES:
+                self.served.popitem(last=False)
+        self.refill_if_low(key, domain)
+        return chosen
+
+    def _unseen(self, key, candidate_id):
+        # Caller holds self.lock
+        seen = self.served.get(candidate_id, set())
+        return [q for q in self.questions.get(key, []) if _question_key(q) not in seen]
+
+    # ---------- filling ----------
+
+    def _round_size(self, key):
+        return HR_ROUND_SIZE if key == HR_KEY else TECH_ROUND_SIZE
+
+    def _generator(self, key, domain):
+        return generate_hr_questions() if key == HR_KEY else generate_technical_questions(domain)
+
+    @staticmethod
+    def _usable(questions):
+        return [q for q in questions if q and not q.startswith(FAILED_PREFIXES)]
+
+    def _merge(self, key, questions):
+        # Caller holds self.lock
+        bank = self.questions.setdefault(key, [])
+        known = {_question_key(q) for q in bank}
+        added = 0
+        for question in questions:
+            if _question_key(question) not in known:
+                known.add(_question_key(question))
+                bank.append(question)
+                added += 1
+        return added
+
+    def _add(self, key, questions):
+        with self.lock:
+            added = self._merge(key, questions)
+        if added:
+            self._save()
+        return added
+
+    # ---------- persistence ----------
+
+    def _read_file(self):
+        try:
+            return load_json(self.path)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"Could not read question bank {self.path}, starting empty: {e}")
+            return {}
+
+    def _save(self):
+        """Merge in what other instances wrote to the bank file, then write it back."""
+        try:
+            with self.save_lock, file_lock(self.path, exclusive=True):
+                on_disk = self._read_file()
+                with self.lock:
+                    for key, questions in on_disk.items():
+                        self._merge(key, questions)
+                    snapshot = {k: list(v) for k, v in self.questions.items()}
+                save_json(self.path, snapshot)
+        except OSError as e:
+            logging.error(f"Could not save question bank: {e}")
+
+    def refill_if_low(self, key, domain=None):
+        with self.lock:
+            if len(self.questions.get(key, [])) >= BANK_LOW_WATER_ROUNDS * self._round_size(key):
+                return False
+        return self._schedule(key, domain)
+
+    def prefetch(self, domain):
+        """Start filling a domain's bank in the background, e.g. as soon as it is identified."""
+        return self.refill_if_low(normalize_domain(domain), domain)
+
+    def prefetch_hr(self):
+        return self.refill_if_low(HR_KEY)
+
+    def _schedule(self, key, domain):
+        with self.lock:
+            if key in self.pending:
+                return False
+            self.pending.add(key)
+            self.refills.append((key, domain))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._refill_loop, name="question-bank", daemon=True)
+                self._thread.start()
+            self.wakeup.notify()
+        return True
+
+    def _refill_loop(self):
+        while True:
+            with self.lock:
+                while not self.refills:
+                    self.wakeup.wait()
+                key, domain = self.refills.popleft()
+            try:
+                target = BANK_TARGET_ROUNDS * self._round_size(key)
+                for _ in range(MAX_REFILL_CALLS):
+                    with self.lock:
+                        if len(self.questions.get(key, [])) >= target:
+                            break
+                    # Refills must not hold up interviews waiting on the rate limit
+                    with priority("background"):
+                        generated = self._generator(key, domain)
+                    added = self._add(key, self._usable(generated))
+                    logging.info(f"Question bank: added {added} questions for '{key}'")
+                    if not added:
+                        break
+            except Exception as e:
+                logging.error(f"Question bank refill for '{key}' failed: {e}")
+            finally:
+                with self.lock:
+                    self.pending.discard(key)
+
+
+question_bank = QuestionBank()
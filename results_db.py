@@ -0,0 +1,181 @@
+import json
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+DB_FILE = os.getenv("RESULTS_DB_FILE", "results.db")
+
+TABLES = {
+    "hr": "hr_results",
+    "tech": "tech_results",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    candidate_id TEXT NOT NULL,
+    domain TEXT,
+    timestamp TEXT NOT NULL,
+    question TEXT,
+    answer TEXT,
+    score INTEGER,
+    feedback TEXT,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_{table}_candidate ON {table} (candidate_id);
+CREATE INDEX IF NOT EXISTS idx_{table}_domain ON {table} (domain);
+CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table} (timestamp);
+"""
+
+_local = threading.local()
+
+
+def get_connection():
+    """Return this thread's connection, creating the schema on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_FILE, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for table in TABLES.values():
+            conn.executescript(SCHEMA.format(table=table))
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        _local.conn = conn
+    return conn
+
+
+def source_paths(kind):
+    """Files whose mtime/size change whenever the stored results change."""
+    return [DB_FILE, f"{DB_FILE}-wal"]
+
+
+def flatten_entries(value):
+    """Yield individual entry dicts from any stored shape (dict, list, nested list)."""
+    if isinstance(value, dict):
+        yield value
+    elif isinstance(value, list):
+        for item in value:
+            yield from flatten_entries(item)
+
+
+def _row(candidate_id, entry):
+    answer = entry.get("answer", entry.get("transcript"))
+    if isinstance(answer, dict):
+        answer = answer.get("text", "")
+    score = entry.get("score")
+    return (
+        candidate_id,
+        entry.get("domain"),
+        entry.get("timestamp") or datetime.now().isoformat(),
+        entry.get("question"),
+        answer,
+        score if isinstance(score, int) else None,
+        entry.get("feedback"),
+        json.dumps(entry),
+    )
+
+
+def _insert(kind, rows, replace=False):
+    conn = get_connection()
+    with conn:
+        if replace:
+            conn.execute(f"DELETE FROM {TABLES[kind]}")
+        conn.executemany(
+            f"INSERT INTO {TABLES[kind]} (candidate_id, domain, timestamp, question, answer, score, feedback, entry) "
+            f"VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+    return len(rows)
+
+
+def save_result(kind, candidate_id, entry):
+    _insert(kind, [_row(candidate_id, e) for e in flatten_entries(entry)])
+
+
+def load_results(kind):
+    """Return {candidate_id: [entries]} in insertion order."""
+    data = {}
+    cursor = get_connection().execute(f"SELECT candidate_id, entry FROM {TABLES[kind]} ORDER BY id")
+    for candidate_id, entry in cursor:
+        data.setdefault(candidate_id, []).append(json.loads(entry))
+    return data
+
+
+def load_candidate_results(kind, candidate_id):
+    cursor = get_connection().execute(
+        f"SELECT entry FROM {TABLES[kind]} WHERE candidate_id = ? ORDER BY id",
+        (candidate_id,),
+    )
+    return [json.loads(entry) for (entry,) in cursor]
+
+
+def domain_score_summary(kind):
+    """Return [(domain, answers, average score)] aggregated in SQL."""
+    cursor = get_connection().execute(
+        f"SELECT domain, COUNT(*), ROUND(AVG(score), 2) FROM {TABLES[kind]} "
+        f"WHERE domain IS NOT NULL GROUP BY domain ORDER BY COUNT(*) DESC"
+    )
+    return cursor.fetchall()
+
+
+def candidate_score_summary(kind, candidate_id):
+    """Return (answers, total score, average score) for one candidate."""
+    cursor = get_connection().execute(
+        f"SELECT COUNT(*), COALESCE(SUM(score), 0), ROUND(AVG(score), 2) FROM {TABLES[kind]} WHERE candidate_id = ?",
+        (candidate_id,),
+    )
+    return cursor.fetchone()
+
+
+def domain_comparison(domain, score):
+    """
+    Return (answers, average score, percentile) over HR and technical rows of
+    a domain, where percentile is the share of candidates whose average is
+    below score. Returns None if no scored answers exist for the domain.
+    """
+    scored = " UNION ALL ".join(
+        f"SELECT candidate_id, score FROM {table} WHERE lower(domain) = ? AND score IS NOT NULL"
+        for table in TABLES.values()
+    )
+    params = [domain.strip().lower()] * len(TABLES)
+    conn = get_connection()
+    answers, average = conn.execute(f"SELECT COUNT(*), AVG(score) FROM ({scored})", params).fetchone()
+    if not answers:
+        return None
+    candidates, below = conn.execute(
+        f"SELECT COUNT(*), SUM(mean < ?) FROM "
+        f"(SELECT AVG(score) AS mean FROM ({scored}) GROUP BY candidate_id)",
+        [score] + params,
+    ).fetchone()
+    return answers, average, below * 100 / candidates
+
+
+def import_results(kind, data, replace=False):
+    """
+    Bulk-load a {candidate_id: entry | [entries]} dict. Returns rows inserted.
+    replace=True empties the table first, in the same transaction.
+    """
+    rows = [
+        _row(candidate_id, entry)
+        for candidate_id, value in data.items()
+        for entry in flatten_entries(value)
+    ]
+    inserted = _insert(kind, rows, replace)
+    logging.info(f"Imported {inserted} {kind} rows into {DB_FILE}")
+    return inserted
+
+
+def is_migrated():
+    row = get_connection().execute("SELECT value FROM meta WHERE key = 'migrated_from_json'").fetchone()
+    return row is not None
+
+
+def mark_migrated():
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from_json', ?)",
+            (datetime.now().isoformat(),),
+        )
@@ -0,0 +1,124 @@
+import json
+import os
+import uuid
+import logging
+import threading
+from datetime import datetime
+from urllib.parse import quote, unquote
+
+import results_db
+
+SHARDS_DIR = os.getenv("RESULTS_SHARDS_DIR", "results")
+
+SHARD_SUFFIX = ".json"
+MIGRATED_MARKER = ".migrated_from_json"
+
+
+def shard_dir(kind):
+    return os.path.join(SHARDS_DIR, kind)
+
+
+def shard_path(kind, candidate_id):
+    # quote() keeps the file name reversible for any candidate_id
+    return os.path.join(shard_dir(kind), quote(candidate_id, safe="") + SHARD_SUFFIX)
+
+
+def source_paths(kind):
+    """Renaming a shard into place updates the directory's mtime."""
+    return [shard_dir(kind)]
+
+
+def _read_shard(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def _write_shard(path, entries):
+    """Write a shard through a private temp file and atomically rename it into place."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def update_shard(kind, candidate_id, update):
+    """
+    Replace the candidate's entries with update(entries) under the shard's file
+    lock, so concurrent read-modify-writes of one shard do not lose entries.
+    """
+    from storage import file_lock
+    path = shard_path(kind, candidate_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with file_lock(path, exclusive=True):
+        _write_shard(path, update(_read_shard(path)))
+
+
+def save_result(kind, candidate_id, entry):
+    """Append entry to the candidate's shard. Writers for different candidates never touch the same file."""
+    update_shard(kind, candidate_id, lambda entries: entries + list(results_db.flatten_entries(entry)))
+
+
+def load_candidate_results(kind, candidate_id):
+    return _read_shard(shard_path(kind, candidate_id))
+
+
+def load_results(kind):
+    """Merged view {candidate_id: [entries]} over all shards of a kind."""
+    data = {}
+    directory = shard_dir(kind)
+    if not os.path.isdir(directory):
+        return data
+    with os.scandir(directory) as it:
+        shards = sorted(
+            (e for e in it if e.is_file() and e.name.endswith(SHARD_SUFFIX)),
+            key=lambda e: e.stat().st_mtime,
+        )
+    for shard in shards:
+        candidate_id = unquote(shard.name[:-len(SHARD_SUFFIX)])
+        try:
+            data[candidate_id] = _read_shard(shard.path)
+        except json.JSONDecodeError as e:
+            logging.error(f"Skipping unreadable shard {shard.path}: {e}")
+    return data
+
+
+def rewrite_results(kind, transform):
+    """Rewrite every shard of a kind as transform(entries), each under its lock. Returns shards rewritten."""
+    candidates = list(load_results(kind))
+    for candidate_id in candidates:
+        update_shard(kind, candidate_id, transform)
+    return len(candidates)
+
+
+def is_migrated():
+    return os.path.exists(os.path.join(SHARDS_DIR, MIGRATED_MARKER))
+
+
+def mark_migrated():
+    os.makedirs(SHARDS_DIR, exist_ok=True)
+    with open(os.path.join(SHARDS_DIR, MIGRATED_MARKER), 'w') as f:
+        f.write(datetime.now().isoformat())
+
+
+def import_results(kind, data):
+    """
+    Split a {candidate_id: entry | [entries]} dict into shards, replacing
+    existing ones. Returns entries written.
+    """
+    written = 0
+    for candidate_id, value in data.items():
+        entries = list(results_db.flatten_entries(value))
+        _write_shard(shard_path(kind, candidate_id), entries)
+        written += len(entries)
+    logging.info(f"Wrote {written} {kind} entries into {shard_dir(kind)}")
+    return written
@@ -0,0 +1,195 @@
+import os
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import whisper
+
+from transcription_cache import cache_key, transcription_cache
+
+# "whisper" (openai-whisper, fp32/fp16), "whisper-int8" (torch dynamic int8 on CPU)
+# or "faster-whisper" (CTranslate2 int8 on CPU)
+ASR_ENGINE = os.getenv("ASR_ENGINE", "whisper")
+
+
+def default_device() -> str:
+    try:
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        return "cpu"
+
+
+class SharedModel:
+    """
+    A loaded Whisper model shared by every session in the process.
+
+    Whisper installs kv-cache hooks on the model while decoding, so calls on
+    one model are serialized with a lock; different model keys run in parallel.
+    """
+
+    engine = "whisper"
+
+    def __init__(self, model_size: str, device: str, precision: str):
+        self.model_size = model_size
+        self.device = device
+        self.precision = precision
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._inference_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    logging.info(f"Loading {self.engine} model: {self.model_size} ({self.device}, {self.precision})")
+                    self._model = self._load()
+        return self._model
+
+    def _load(self):
+        return whisper.load_model(self.model_size, device=self.device)
+
+    def transcribe(self, audio: np.ndarray, use_cache: bool = True, **options) -> Dict:
+        """
+        Whisper-style result: {"text", "language", "segments": [{"start", "end", "text"}]}
+
+        Results for in-memory audio are cached by content, so identical
+        audio with identical settings is only decoded once; use_cache=False
+        always decodes and leaves the cache untouched (e.g. for benchmarks).
+        """
+        key = None
+        if use_cache and isinstance(audio, np.ndarray):
+            settings = {
+                "engine": self.engine,
+                "model_size": self.model_size,
+                "device": self.device,
+                "precision": self.precision,
+                "options": options,
+            }
+            key = cache_key(audio, settings)
+            cached = transcription_cache.get(key)
+            if cached is not None:
+                return cached
+
+        model = self.load()
+        with self._inference_lock:
+            result = self._transcribe(model, audio, dict(options))
+        if key is not None:
+            transcription_cache.put(key, result)
+        return result
+
+    def _transcribe(self, model, audio, options: Dict) -> Dict:
+        options.setdefault("fp16", self.precision == "fp16")
+        return model.transcribe(audio, **options)
+
+
+class QuantizedWhisperModel(SharedModel):
+    """
+    openai-whisper with its linear layers dynamically quantized to int8.
+
+    Weights are stored as int8 and activations quantized on the fly, which
+    roughly halves CPU decode time for the attention/MLP-bound small models.
+    """
+
+    engine = "whisper-int8"
+
+    def _load(self):
+        import torch
+        model = whisper.load_model(self.model_size, device="cpu")
+        # Whisper subclasses nn.Linear only to cast dtypes; quantize_dynamic
+        # needs the exact class to pick its int8 replacement
+        for module in model.modules():
+            if isinstance(module, torch.nn.Linear):
+                module.__class__ = torch.nn.Linear
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def _transcribe(self, model, audio, options: Dict) -> Dict:
+        options["fp16"] = False
+        return model.transcribe(audio, **options)
+
+
+class FasterWhisperModel(SharedModel):
+    """Whisper converted to CTranslate2 (faster-whisper) running int8 kernels on CPU."""
+
+    engine = "faster-whisper"
+
+    def _load(self):
+        from faster_whisper import WhisperModel
+        return WhisperModel(self.model_size, device="cpu", compute_type=self.precision)
+
+    def _transcribe(self, model, audio, options: Dict) -> Dict:
+        options.pop("fp16", None)
+        # openai-whisper decodes greedily by default; match it
+        options.setdefault("beam_size", 1)
+        segments, info = model.transcribe(audio, **options)
+        segments = [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+        return {
+            "text": "".join(s["text"] for s in segments),
+            "language": info.language,
+            "segments": segments,
+        }
+
+
+ENGINES = {
+    "whisper": SharedModel,
+    "whisper-int8": QuantizedWhisperModel,
+    "faster-whisper": FasterWhisperModel,
+}
+
+
+class ModelRegistry:
+    """Process-wide models keyed by (engine, model size, device, precision), loaded on first use."""
+
+    def __init__(self):
+        self._models: Dict[Tuple[str, str, str, str], SharedModel] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_size: str = "base", device: Optional[str] = None, precision: Optional[str] = None,
+            engine: Optional[str] = None) -> SharedModel:
+        engine = engine or ASR_ENGINE
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown ASR engine '{engine}', expected one of {sorted(ENGINES)}")
+        if engine == "whisper":
+            device = device or default_device()
+            # fp16 is only worthwhile (and supported by Whisper) on GPU
+            precision = precision or ("fp16" if device == "cuda" else "fp32")
+        else:
+            # Quantized engines are CPU-only
+            device, precision = "cpu", precision or "int8"
+        key = (engine, model_size, device, precision)
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = ENGINES[engine](model_size, device, precision)
+            return self._models[key]
+
+    def warm_up(self, model_sizes, background: bool = True):
+        """Load the given model sizes now instead of on the first transcription."""
+        def load_all():
+            for model_size in model_sizes:
+                try:
+                    self.get(model_size).load()
+                except Exception as e:
+                    logging.error(f"Failed to warm up Whisper model '{model_size}': {e}")
+
+        if background:
+            thread = threading.Thread(target=load_all, daemon=True)
+            thread.start()
+            return thread
+        load_all()
+        return None
+
+
+registry = ModelRegistry()
+
+
+def warm_up_from_env(background: bool = True):
+    """Warm up the comma-separated model sizes in WHISPER_WARMUP, if set."""
+    model_sizes = [size.strip() for size in os.getenv("WHISPER_WARMUP", "").split(",") if size.strip()]
+    if model_sizes:
+        return registry.warm_up(model_sizes, background=background)
+    return None
@@ -1,9 +1,48 @@
 import json
 import os
+import sys
+import logging
+import threading
+import tempfile
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: compaction is only serialized within this process
+    fcntl = None
+
+import results_db
+import results_shards
+import transcripts
 
 HR_RESULTS_FILE = 'hr_results.json'
 TECH_RESULTS_FILE = 'tech_results.json'
 
+# New entries are appended to a JSONL log next to each results file and folded
+# back into the JSON snapshot once the log grows past this size.
+HR_RESULTS_LOG = 'hr_results.jsonl'
+TECH_RESULTS_LOG = 'tech_results.jsonl'
+COMPACT_THRESHOLD_BYTES = int(os.getenv("RESULTS_COMPACT_THRESHOLD_BYTES", 4 * 1024 * 1024))
+
+# "log" keeps results in the JSON files above, "sqlite" uses results_db and
+# "shards" writes one file per candidate through results_shards.
+RESULTS_BACKEND = os.getenv("RESULTS_BACKEND", "log")
+RESULTS_BACKENDS = {
+    "sqlite": results_db,
+    "shards": results_shards,
+}
+
+LOG_FILES = {
+    "hr": (HR_RESULTS_FILE, HR_RESULTS_LOG),
+    "tech": (TECH_RESULTS_FILE, TECH_RESULTS_LOG),
+}
+
+# Upper bound for the in-process results cache (approximate JSON bytes).
+RESULTS_CACHE_MAX_BYTES = int(os.getenv("RESULTS_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
 
 def load_json(filepath):
     if os.path.exists(filepath):
@@ -12,33 +51,486 @@ def load_json(filepath):
     return {}
 
 def save_json(filepath, data):
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=2)
+    """Write data to filepath atomically (temp file + rename)."""
+    # A temp name of our own, so concurrent writers never share or promote each other's file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(filepath) or ".", prefix=os.path.basename(filepath), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+_local_file_lock = threading.RLock()
+
+@contextmanager
+def file_lock(filepath, exclusive=False):
+    """
+    Inter-process lock on filepath (via filepath.lock): shared or exclusive.
+    Not re-entrant; without fcntl it only serializes threads of this process.
+    """
+    if fcntl is None:
+        with _local_file_lock:
+            yield
+        return
+    with open(f"{filepath}.lock", 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+# APPEND-ONLY LOG
+
+def _add_entry(data, candidate_id, entry):
+    existing = data.get(candidate_id)
+    if existing is None:
+        data[candidate_id] = []
+    elif not isinstance(existing, list):
+        # Older rows store a single dict per candidate
+        data[candidate_id] = [existing]
+    data[candidate_id].append(entry)
+
+def append_log(log_path, candidate_id, entries):
+    """
+    Append entries as JSON lines in a single write and fsync it.
+    Returns (log size after the write, bytes this call appended).
+    """
+    record = "".join(
+        json.dumps({"candidate_id": candidate_id, "entry": entry}) + "\n" for entry in entries
+    ).encode("utf-8")
+    written = len(record)
+    with open(log_path, 'a+b') as f:
+        # A crash mid-write can leave a torn last line; start on a fresh line
+        # so the new record is not glued onto it.
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+                written += 1
+        f.write(record)
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell(), written
+
+def replay_log(log_path, data):
+    """Apply every complete record in log_path to data (in place)."""
+    if not os.path.exists(log_path):
+        return data
+    with open(log_path, 'r', encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f"Skipping torn record in {log_path} at line {line_no}")
+                continue
+            _add_entry(data, record["candidate_id"], record["entry"])
+    return data
+
+def _compaction_paths(results_file, log_path):
+    # Only compact_results writes the .compact.tmp snapshot
+    return f"{log_path}.compacting", f"{results_file}.compact.tmp"
+
+def _recover_compaction(results_file, log_path):
+    """Finish or roll back a compaction interrupted by a crash. Caller holds the exclusive lock."""
+    compacting, tmp_path = _compaction_paths(results_file, log_path)
+    if os.path.exists(tmp_path):
+        if os.path.exists(compacting):
+            # Snapshot may be partial; the compacting log is still authoritative
+            os.remove(tmp_path)
+        else:
+            # Snapshot was fully written before the log segment was dropped
+            os.replace(tmp_path, results_file)
+    return compacting
+
+def load_results(results_file, log_path):
+    """Snapshot plus log, read under the shared file lock; never modifies the files."""
+    compacting, tmp_path = _compaction_paths(results_file, log_path)
+    with file_lock(results_file):
+        snapshot = results_file
+        if os.path.exists(tmp_path) and not os.path.exists(compacting):
+            # A crashed compaction left its finished snapshot unpromoted
+            snapshot = tmp_path
+        data = load_json(snapshot)
+        replay_log(compacting, data)
+        replay_log(log_path, data)
+    return data
+
+def compact_results(results_file, log_path, transform=None):
+    """
+    Fold the append log into the JSON snapshot and start a fresh log.
+
+    transform(data), if given, returns the data to write instead, e.g. a
+    rewrite of old entries; the snapshot is rewritten even with no log.
+    """
+    # Exclusive: readers and appenders hold the lock shared
+    with file_lock(results_file, exclusive=True):
+        compacting = _recover_compaction(results_file, log_path)
+        if not os.path.exists(compacting):
+            if os.path.exists(log_path):
+                os.replace(log_path, compacting)
+            elif transform is None:
+                return
+
+        data = load_json(results_file)
+        replay_log(compacting, data)
+        if transform is not None:
+            data = transform(data)
+
+        _, tmp_path = _compaction_paths(results_file, log_path)
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(compacting):
+            os.remove(compacting)
+        os.replace(tmp_path, results_file)
+    logging.info(f"Compacted {log_path} into {results_file}")
+
+def save_result(results_file, log_path, candidate_id, entries):
+    """Append entries to the log (compacting it when large); returns the bytes appended."""
+    # Shared lock: a compaction must not rename the log between our open and write
+    with file_lock(results_file):
+        log_size, written = append_log(log_path, candidate_id, entries)
+    if log_size >= COMPACT_THRESHOLD_BYTES:
+        compact_results(results_file, log_path)
+    return written
+
+
+# RESULTS CACHE
+
+class ResultsCache:
+    """
+    Process-wide cache of loaded results, kept as per-candidate slices.
+
+    A kind's slices are valid while the (path, mtime, size) signature of its
+    backing files is unchanged. Writes made through this module update the
+    cached slice in place; anything else that touches the files invalidates
+    the kind. Slices are evicted least-recently-used once the approximate
+    size exceeds max_bytes. Returned values are shared and must not be mutated.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.slices = OrderedDict()  # (kind, candidate_id) -> (value, size)
+        self.signatures = {}         # kind -> signature the slices were read at
+        self.complete = set()        # kinds whose every candidate is cached
+        self.size = 0
+
+    def _drop_kind(self, kind):
+        for key in [key for key in self.slices if key[0] == kind]:
+            self.size -= self.slices.pop(key)[1]
+        self.signatures.pop(kind, None)
+        self.complete.discard(kind)
+
+    def _put(self, kind, candidate_id, value):
+        key = (kind, candidate_id)
+        if key in self.slices:
+            self.size -= self.slices.pop(key)[1]
+        size = len(json.dumps(value))
+        self.slices[key] = (value, size)
+        self.size += size
+        while self.size > self.max_bytes and len(self.slices) > 1:
+            (evicted_kind, _), (_, evicted_size) = self.slices.popitem(last=False)
+            self.size -= evicted_size
+            self.complete.discard(evicted_kind)
+
+    def _validate(self, kind, signature):
+        if self.signatures.get(kind) != signature:
+            self._drop_kind(kind)
+            self.signatures[kind] = signature
+
+    def get_all(self, kind, signature):
+        with self.lock:
+            self._validate(kind, signature)
+            if kind not in self.complete:
+                return None
+            data = {}
+            for (slice_kind, candidate_id), (value, _) in self.slices.items():
+                if slice_kind == kind:
+                    data[candidate_id] = value
+            for candidate_id in data:
+                self.slices.move_to_end((kind, candidate_id))
+            return data
+
+    def put_all(self, kind, signature, data):
+        with self.lock:
+            self._validate(kind, signature)
+            for candidate_id, value in data.items():
+                self._put(kind, candidate_id, value)
+            if all((kind, candidate_id) in self.slices for candidate_id in data):
+                self.complete.add(kind)
+
+    def get_candidate(self, kind, signature, candidate_id):
+        with self.lock:
+            self._validate(kind, signature)
+            key = (kind, candidate_id)
+            if key in self.slices:
+                self.slices.move_to_end(key)
+                return self.slices[key][0]
+            if kind in self.complete:
+                return []
+            return None
+
+    def put_candidate(self, kind, signature, candidate_id, value):
+        with self.lock:
+            self._validate(kind, signature)
+            self._put(kind, candidate_id, value)
+
+    def invalidate(self, kind):
+        with self.lock:
+            self._drop_kind(kind)
+
+    def apply_write(self, kind, old_signature, new_signature, candidate_id, add):
+        """Fold a write into the cached slice if the cache was current before it."""
+        with self.lock:
+            if self.signatures.get(kind) != old_signature:
+                self._drop_kind(kind)
+                return
+            self.signatures[kind] = new_signature
+            key = (kind, candidate_id)
+            if key in self.slices:
+                data = {candidate_id: self.slices[key][0]}
+            elif kind in self.complete:
+                data = {}
+            else:
+                return
+            add(data)
+            self._put(kind, candidate_id, data[candidate_id])
+
+    def clear(self):
+        with self.lock:
+            self.slices.clear()
+            self.signatures.clear()
+            self.complete.clear()
+            self.size = 0
+
+
+results_cache = ResultsCache(RESULTS_CACHE_MAX_BYTES)
+
+# Callables run as listener(kind, candidate_id, entries) after every save
+write_listeners = []
+
+
+def add_write_listener(listener):
+    if listener not in write_listeners:
+        write_listeners.append(listener)
+
+
+def _signature(kind):
+    backend = RESULTS_BACKENDS.get(RESULTS_BACKEND)
+    if backend:
+        paths = backend.source_paths(kind)
+    else:
+        results_file, log_path = LOG_FILES[kind]
+        paths = [results_file, log_path, f"{log_path}.compacting"]
+    signature = [RESULTS_BACKEND]
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+def _only_appended(old_signature, new_signature, log_path, written):
+    """True if the files changed by exactly our append of written bytes to log_path, i.e. no other writer got in."""
+    for before, after in zip(old_signature[1:], new_signature[1:]):
+        if before[0] == log_path:
+            if (before[2] or 0) + written != after[2]:
+                return False
+        elif before != after:
+            return False
+    return True
+
+def _save(kind, candidate_id, entries):
+    entries = [transcripts.compact_entry(entry) for entry in entries]
+    old_signature = _signature(kind)
+    backend = RESULTS_BACKENDS.get(RESULTS_BACKEND)
+    if backend:
+        backend.save_result(kind, candidate_id, entries)
+    else:
+        written = save_result(*LOG_FILES[kind], candidate_id, entries)
+    new_signature = _signature(kind)
+
+    def add(data):
+        if backend:
+            # Database and shard backends store entries flattened
+            data[candidate_id] = list(data.get(candidate_id, [])) + list(results_db.flatten_entries(entries))
+        else:
+            value = data.get(candidate_id)
+            data[candidate_id] = list(value) if isinstance(value, list) else value
+            for entry in entries:
+                _add_entry(data, candidate_id, entry)
+
+    # Another process (or thread) may have written between the two signatures; the
+    # cache can only be patched when the change is provably ours. The database and
+    # shard backends give no such proof.
+    if not backend and _only_appended(old_signature, new_signature, LOG_FILES[kind][1], written):
+        results_cache.apply_write(kind, old_signature, new_signature, candidate_id, add)
+    else:
+        results_cache.invalidate(kind)
+
+    for listener in write_listeners:
+        try:
+            listener(kind, candidate_id, entries)
+        except Exception as e:
+            logging.error(f"Results write listener failed: {e}")
+
+def _load(kind):
+    signature = _signature(kind)
+    data = results_cache.get_all(kind, signature)
+    if data is not None:
+        return data
+    backend = RESULTS_BACKENDS.get(RESULTS_BACKEND)
+    if backend:
+        data = backend.load_results(kind)
+    else:
+        data = load_results(*LOG_FILES[kind])
+    results_cache.put_all(kind, signature, data)
+    return dict(data)
+
+def _load_candidate(kind, candidate_id):
+    signature = _signature(kind)
+    value = results_cache.get_candidate(kind, signature, candidate_id)
+    if value is None:
+        backend = RESULTS_BACKENDS.get(RESULTS_BACKEND)
+        if not backend:
+            return list(results_db.flatten_entries(_load(kind).get(candidate_id, [])))
+        value = backend.load_candidate_results(kind, candidate_id)
+        results_cache.put_candidate(kind, signature, candidate_id, value)
+    return list(results_db.flatten_entries(value))
 
 
 # HR FUNCTIONS
 
 def save_hr_result(candidate_id, hr_entry):
-    data = load_json(HR_RESULTS_FILE)
-    if candidate_id not in data:
-        data[candidate_id] = []
-    data[candidate_id].append(hr_entry)
-    save_json(HR_RESULTS_FILE, data)
+    _save("hr", candidate_id, [hr_entry])
+
+def save_hr_results(candidate_id, hr_entries):
+    """Save several HR entries in one write"""
+    _save("hr", candidate_id, list(hr_entries))
 
 def load_hr_results():
     """Return full dict {candidate_id: [list of HR entries]}"""
-    return load_json(HR_RESULTS_FILE)
+    return _load("hr")
+
+def load_candidate_hr_results(candidate_id):
+    """Return the HR entries of one candidate"""
+    return _load_candidate("hr", candidate_id)
 
 
 # TECH FUNCTIONS
 
 def save_tech_result(candidate_id, tech_entry):
-    data = load_json(TECH_RESULTS_FILE)
-    if candidate_id not in data:
-        data[candidate_id] = []
-    data[candidate_id].append(tech_entry)
-    save_json(TECH_RESULTS_FILE, data)
+    _save("tech", candidate_id, [tech_entry])
+
+def save_tech_results(candidate_id, tech_entries):
+    """Save several Tech entries in one write"""
+    _save("tech", candidate_id, list(tech_entries))
 
 def load_tech_results():
     """Return full dict {candidate_id: [list of Tech entries]}"""
-    return load_json(TECH_RESULTS_FILE)
+    return _load("tech")
+
+def load_candidate_tech_results(candidate_id):
+    """Return the Tech entries of one candidate"""
+    return _load_candidate("tech", candidate_id)
+
+
+# SESSION BUFFER
+
+def _flush_pending(candidate_id, pending):
+    for kind, entries in pending.items():
+        if entries:
+            _save(kind, candidate_id, [entries[index] for index in sorted(entries)])
+            entries.clear()
+
+
+class ResultBuffer:
+    """
+    Write-behind buffer for one interview session.
+
+    Entries are keyed by (round, question index), so re-submitting an answer
+    replaces the buffered one instead of writing a duplicate. flush() writes a
+    round's entries in a single storage call; whatever is still pending is
+    flushed when the buffer is garbage collected or the process exits.
+    """
+
+    def __init__(self, candidate_id):
+        self.candidate_id = candidate_id
+        self.pending = {"hr": {}, "tech": {}}
+        self.flushed = set()
+        self.lock = threading.Lock()
+        self._finalizer = weakref.finalize(self, _flush_pending, candidate_id, self.pending)
+
+    def add(self, kind, question_index, entry):
+        with self.lock:
+            if (kind, question_index) in self.flushed:
+                logging.warning(f"{kind} answer {question_index} of {self.candidate_id} already saved; ignoring")
+                return
+            entry = dict(entry)
+            entry.setdefault("timestamp", datetime.now().isoformat())
+            self.pending[kind][question_index] = entry
+
+    def flush(self, kind=None):
+        with self.lock:
+            kinds = [kind] if kind else list(self.pending)
+            for k in kinds:
+                self.flushed.update((k, index) for index in self.pending[k])
+            _flush_pending(self.candidate_id, {k: self.pending[k] for k in kinds})
+
+    def close(self):
+        self.flush()
+        self._finalizer.detach()
+
+
+# MAINTENANCE
+
+def compact_all():
+    for results_file, log_path in LOG_FILES.values():
+        compact_results(results_file, log_path)
+
+def migrate_to_sqlite(force=False):
+    """One-shot import of the JSON results (snapshot + log) into results_db."""
+    if results_db.is_migrated() and not force:
+        logging.info("Results already migrated to SQLite; pass force=True to import again.")
+        return 0
+    # A forced re-import replaces what the first one wrote instead of adding to it
+    imported = sum(
+        results_db.import_results(kind, load_results(*files), replace=force) for kind, files in LOG_FILES.items()
+    )
+    results_db.mark_migrated()
+    return imported
+
+def migrate_to_shards(force=False):
+    """One-shot split of the JSON results (snapshot + log) into per-candidate shards."""
+    if results_shards.is_migrated() and not force:
+        # Shards written since the first migration would be overwritten
+        logging.info("Results already migrated to shards; pass force=True to overwrite them.")
+        return 0
+    written = sum(results_shards.import_results(kind, load_results(*files)) for kind, files in LOG_FILES.items())
+    results_shards.mark_migrated()
+    return written
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "compact"
+    if command == "compact":
+        compact_all()
+    elif command == "migrate-sqlite":
+        print(f"Imported {migrate_to_sqlite(force='--force' in sys.argv)} rows")
+    elif command == "migrate-shards":
+        print(f"Wrote {migrate_to_shards(force='--force' in sys.argv)} entries")
+    else:
+        print("Usage: python storage.py [compact | migrate-sqlite [--force] | migrate-shards [--force]]")
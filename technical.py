@@ -1,19 +1,12 @@
-import os
 import re
 import logging
-import json
-from dotenv import load_dotenv
-from groq import Groq
 from datetime import datetime
+from llm import chat, achat, parse_json_reply
+from storage import save_tech_result
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-TECHNICAL_RESULTS_FILE = "tech_results.json"
-
 # ------------------- Generate Questions -------------------
 def generate_technical_questions(domain, num_questions=10):
     """
@@ -30,15 +23,13 @@ def generate_technical_questions(domain, num_questions=10):
     )
 
     try:
-        response = client.chat.completions.create(
+        content = chat(
             model="llama3-70b-8192",
             messages=[
                 {"role": "system", "content": "You are a helpful assistant that generates technical interview questions."},
                 {"role": "user", "content": prompt}
             ]
-        )
-
-        content = response.choices[0].message.content.strip()
+        ).strip()
         logging.debug(f"Raw response from model: {content}")
 
         questions = [
@@ -60,12 +51,35 @@ def generate_technical_questions(domain, num_questions=10):
 
 # ------------------- Evaluate Answer -------------------
 def evaluate_technical_answer(question, answer, domain):
-    import streamlit as st  # Needed for session and display
-
+    """
+    Scores a technical answer out of 10. Runs on background job workers,
+    so it reports problems through logging rather than Streamlit calls.
+    """
     logging.info(f"Assessing technical answer for domain '{domain}'")
     logging.debug(f"Question: {question}")
     logging.debug(f"Answer: {answer}")
 
+    try:
+        result = chat(model="llama3-70b-8192", messages=_technical_evaluation_messages(question, answer, domain))
+        return _parse_technical_evaluation(result)
+
+    except Exception as e:
+        logging.error(f"Error evaluating technical answer: {e}")
+        return 0, f"Error evaluating technical answer: {e}"
+
+async def aevaluate_technical_answer(question, answer, domain):
+    """Async evaluate_technical_answer() on the shared AsyncGroq client."""
+    logging.info(f"Assessing technical answer for domain '{domain}'")
+
+    try:
+        result = await achat(model="llama3-70b-8192", messages=_technical_evaluation_messages(question, answer, domain))
+        return _parse_technical_evaluation(result)
+
+    except Exception as e:
+        logging.error(f"Error evaluating technical answer: {e}")
+        return 0, f"Error evaluating technical answer: {e}"
+
+def _technical_evaluation_messages(question, answer, domain):
     prompt = (
         f"You are evaluating a technical interview answer.\n\n"
         f"Domain: {domain}\n"
@@ -77,44 +91,88 @@ def evaluate_technical_answer(question, answer, domain):
         f"Return strictly the score (out of 10) and 1-2 lines of feedback. Example:\n"
         f"Score: 7/10\nFeedback: Correct concept but lacks depth."
     )
+    return [
+        {"role": "system", "content": "You are a technical interview evaluator."},
+        {"role": "user", "content": prompt}
+    ]
 
-    try:
-        response = client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=[
-                {"role": "system", "content": "You are a technical interview evaluator."},
-                {"role": "user", "content": prompt}
-            ]
-        )
+def _parse_technical_evaluation(result):
+    result = result.strip()
+    logging.debug(f"Raw evaluation result: {result}")
 
-        result = response.choices[0].message.content.strip()
-        logging.debug(f"Raw evaluation result: {result}")
-        st.write(f"Raw LLM response: {result}")  # Optional: for debug
+    score_match = re.search(r"Score:\s*(\d+)/10", result)
+    feedback_match = re.search(r"Feedback:\s*(.+)", result, re.DOTALL)
 
-        score_match = re.search(r"Score:\s*(\d+)/10", result)
-        feedback_match = re.search(r"Feedback:\s*(.+)", result, re.DOTALL)
+    if not score_match or not feedback_match:
+        logging.warning(f"Unable to extract score/feedback from LLM response: {result}")
+        return 0, "LLM returned an unrecognized format."
 
-        if not score_match or not feedback_match:
-            st.warning("⚠️ Unable to extract score/feedback from LLM response.")
-            return 0, "LLM returned an unrecognized format."
+    score = int(score_match.group(1))
+    feedback = feedback_match.group(1).strip()
 
-        score = int(score_match.group(1))
-        feedback = feedback_match.group(1).strip()
+    return score, feedback
 
-        candidate_id = st.session_state.get("candidate_id", "default_user")
-        store_technical_result_to_json(question, answer, score, feedback, domain, candidate_id)
+# ------------------- Evaluate Round -------------------
+def evaluate_technical_answers(qa_pairs, domain):
+    """
+    Scores a list of (question, answer) pairs with a single LLM request.
+    Returns one (score, feedback) per pair, in order; pairs missing from or
+    malformed in the batch reply are evaluated one by one instead.
+    """
+    if not qa_pairs:
+        return []
+    logging.info(f"Batch-assessing {len(qa_pairs)} technical answers for domain '{domain}'")
 
-        return score, feedback
+    answers_block = "\n\n".join(
+        f"{i}. Question: {question}\n   Candidate's Answer: {answer}"
+        for i, (question, answer) in enumerate(qa_pairs, 1)
+    )
+    prompt = (
+        f"You are evaluating technical interview answers.\n\n"
+        f"Domain: {domain}\n\n"
+        f"{answers_block}\n\n"
+        f"Evaluate each answer out of 10 based on:\n"
+        f"1. Correctness\n"
+        f"2. Keyword relevance\n\n"
+        f"Return only JSON in this format, with 1-2 lines of feedback per answer:\n"
+        f'{{"evaluations": [{{"index": <number>, "score": <0-10>, "feedback": "<feedback>"}}]}}'
+    )
 
+    parsed = {}
+    try:
+        result = chat(
+            model="llama3-70b-8192",
+            messages=[
+                {"role": "system", "content": "You are a technical interview evaluator."},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"}
+        )
+        for item in parse_json_reply(result).get("evaluations", []):
+            try:
+                index = int(item["index"])
+                score = max(0, min(10, int(item["score"])))
+                feedback = str(item["feedback"]).strip()
+            except (KeyError, TypeError, ValueError):
+                continue
+            if feedback:
+                parsed[index] = (score, feedback)
     except Exception as e:
-        st.error(f"❌ LLM evaluation failed: {e}")
-        logging.error(f"Error evaluating technical answer: {e}")
-        return 0, f"Error evaluating technical answer: {e}"
+        logging.error(f"Batch technical evaluation failed, falling back to per-answer calls: {e}")
+
+    missing = [i for i in range(1, len(qa_pairs) + 1) if i not in parsed]
+    if missing:
+        logging.warning(f"Batch technical evaluation missed {len(missing)} answer(s); evaluating them individually")
+    return [
+        parsed[i] if i in parsed else evaluate_technical_answer(question, answer, domain)
+        for i, (question, answer) in enumerate(qa_pairs, 1)
+    ]
 
 # ------------------- Store Result -------------------
 def store_technical_result_to_json(question, answer, score, feedback, domain, candidate_id="default_user"):
     """
-    Appends the technical evaluation result to a JSON file.
+    Saves a single technical evaluation result through the storage module.
+    The interview flow buffers its results in storage.ResultBuffer instead.
     """
     result_entry = {
         "timestamp": datetime.now().isoformat(),
@@ -127,17 +185,7 @@ def store_technical_result_to_json(question, answer, score, feedback, domain, ca
     }
 
     try:
-        if os.path.exists(TECHNICAL_RESULTS_FILE):
-            with open(TECHNICAL_RESULTS_FILE, "r") as file:
-                data = json.load(file)
-        else:
-            data = []
-
-        data.append(result_entry)
-
-        with open(TECHNICAL_RESULTS_FILE, "w") as file:
-            json.dump(data, file, indent=4)
-
+        save_tech_result(candidate_id, result_entry)
         logging.info(f"Stored technical result for candidate '{candidate_id}'.")
 
     except Exception as e:
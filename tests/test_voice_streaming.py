@@ -0,0 +1,55 @@
+import re
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sounddevice")
+pytest.importorskip("scipy")
+voice = pytest.importorskip("voice")
+
+RATE = 100  # samples per second; the fake model only looks at sample values
+
+
+class FakeModel:
+    """Reads absolute positions back from the samples and says one word per second."""
+
+    def __init__(self, segment_seconds):
+        self.segment_seconds = segment_seconds
+
+    def transcribe(self, audio, **options):
+        origin = audio[0] / RATE
+        duration = len(audio) / RATE
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(start + self.segment_seconds, duration)
+            words = [f"w{t}" for t in range(int(np.ceil(origin + start)), int(np.ceil(origin + end)))]
+            segments.append({"start": start, "end": end, "text": " ".join(words)})
+            start = end
+        return {"language": "en", "segments": segments}
+
+
+class FakeRecorder:
+    sample_rate = RATE
+    trim_silence = False
+    is_recording = False
+
+    def __init__(self, model, seconds):
+        self.model = model
+        self._ring = voice.AudioRingBuffer(60 * RATE)
+        self._ring.write(np.arange(seconds * RATE, dtype=np.float32))
+
+    def captured_view(self):
+        return self._ring.view()
+
+
+@pytest.mark.parametrize("segment_seconds", [3.5, 5.0, 10.0])
+def test_segments_crossing_the_overlap_are_not_lost(segment_seconds):
+    recorder = FakeRecorder(FakeModel(segment_seconds), seconds=25)
+    stream = voice._StreamingTranscriber(recorder, window_seconds=10, overlap_seconds=1)
+    stream.start()
+    stream._thread.join()
+    result = stream.finish()
+
+    heard = set(re.findall(r"w\d+", result["text"]))
+    assert heard == {f"w{t}" for t in range(25)}
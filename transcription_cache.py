@@ -0,0 +1,104 @@
+import copy
+import hashlib
+import json
+import os
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+TRANSCRIPTION_CACHE_SIZE = int(os.getenv("TRANSCRIPTION_CACHE_SIZE", 256))
+# Unset: memory only. Set: results also persist as JSON files under this directory
+TRANSCRIPTION_CACHE_DIR = os.getenv("TRANSCRIPTION_CACHE_DIR") or None
+
+
+def cache_key(audio: np.ndarray, settings: Dict) -> str:
+    """blake2b of the PCM samples plus the model and decode settings that shape the result."""
+    digest = hashlib.blake2b(digest_size=16)
+    pcm = np.ascontiguousarray(audio, dtype=np.float32)
+    digest.update(pcm.data.cast("B"))
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """
+    Transcription results keyed by cache_key().
+
+    The memory tier holds the max_entries most recently used results; the
+    optional disk tier keeps one small JSON file per key so results survive
+    restarts and are shared by every worker process on the machine.
+    """
+
+    def __init__(self, max_entries: int = TRANSCRIPTION_CACHE_SIZE, disk_dir: Optional[str] = TRANSCRIPTION_CACHE_DIR):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> result
+        self.hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Ignoring unreadable transcription cache entry {key}: {e}")
+            return None
+
+    def _write_disk(self, key: str, result: Dict):
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(result, f, default=str)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logging.warning(f"Could not write transcription cache entry {key}: {e}")
+
+    def _remember(self, key: str, result: Dict):
+        # Caller holds self.lock
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+        if result is None and self.disk_dir:
+            result = self._read_disk(key)
+            if result is not None:
+                with self.lock:
+                    self._remember(key, result)
+        with self.lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return copy.deepcopy(result)
+
+    def put(self, key: str, result: Dict):
+        result = copy.deepcopy(result)
+        with self.lock:
+            self._remember(key, result)
+        if self.disk_dir:
+            self._write_disk(key, result)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+transcription_cache = TranscriptionCache()
@@ -0,0 +1,95 @@
+import os
+import sys
+import hashlib
+import logging
+from array import array
+
+# What to keep of Whisper's per-segment output when an entry is saved:
+#   "timing" - text/language inline, segment start/end times in a sidecar file
+#   "none"   - text/language inline, segments dropped
+#   "full"   - store the transcription dict untouched
+TRANSCRIPT_RETENTION = os.getenv("TRANSCRIPT_RETENTION", "timing")
+SIDECAR_DIR = os.getenv("TRANSCRIPT_SIDECAR_DIR", "transcripts")
+
+TRANSCRIPT_FIELDS = ("answer", "transcript")
+INLINE_KEYS = ("text", "language", "path")
+
+
+def save_segment_timings(segments):
+    """Store [start, end] pairs as a flat float32 array. Returns the sidecar reference."""
+    timings = array('f')
+    for segment in segments:
+        timings.append(float(segment.get("start", 0.0)))
+        timings.append(float(segment.get("end", 0.0)))
+    payload = timings.tobytes()
+    # Content-addressed, so rewriting the same transcript twice reuses the file
+    name = hashlib.sha1(payload).hexdigest()[:16] + ".f32"
+    path = os.path.join(SIDECAR_DIR, name)
+    if not os.path.exists(path):
+        os.makedirs(SIDECAR_DIR, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    return {"file": name, "count": len(segments)}
+
+
+def load_segment_timings(ref):
+    """Return [(start, end)] for a sidecar reference written by save_segment_timings."""
+    timings = array('f')
+    with open(os.path.join(SIDECAR_DIR, ref["file"]), 'rb') as f:
+        timings.frombytes(f.read())
+    return list(zip(timings[0::2], timings[1::2]))
+
+
+def compact_transcription(transcription, retention=None):
+    """Reduce a VoiceRecorder.transcribe() dict to its inline fields."""
+    retention = retention or TRANSCRIPT_RETENTION
+    if retention == "full" or "segments" not in transcription:
+        return transcription
+    compact = {key: transcription[key] for key in INLINE_KEYS if key in transcription}
+    segments = transcription.get("segments") or []
+    if retention == "timing" and segments:
+        compact["segments_ref"] = save_segment_timings(segments)
+    return compact
+
+
+def compact_entry(entry, retention=None):
+    """Return entry (dict or list of entries) with transcription dicts compacted."""
+    if isinstance(entry, list):
+        return [compact_entry(item, retention) for item in entry]
+    if not isinstance(entry, dict):
+        return entry
+    compact = dict(entry)
+    for field in TRANSCRIPT_FIELDS:
+        if isinstance(compact.get(field), dict):
+            compact[field] = compact_transcription(compact[field], retention)
+    return compact
+
+
+def compact_results(data, retention=None):
+    """Compact every entry of a {candidate_id: entries} dict."""
+    return {candidate_id: compact_entry(value, retention) for candidate_id, value in data.items()}
+
+
+def rewrite_existing_results(retention=None):
+    """Rewrite the stored results of the active storage backend with compacted transcripts."""
+    import storage
+    import results_shards
+
+    if storage.RESULTS_BACKEND == "sqlite":
+        logging.warning("Run the rewrite on the JSON files before 'python storage.py migrate-sqlite'.")
+        return
+
+    for kind, (results_file, log_path) in storage.LOG_FILES.items():
+        if storage.RESULTS_BACKEND == "shards":
+            results_shards.rewrite_results(kind, lambda entries: compact_entry(entries, retention))
+            continue
+        before = os.path.getsize(results_file) if os.path.exists(results_file) else 0
+        storage.compact_results(results_file, log_path, lambda data: compact_results(data, retention))
+        logging.info(f"Rewrote {results_file}: {before} -> {os.path.getsize(results_file)} bytes")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    rewrite_existing_results(sys.argv[1] if len(sys.argv) > 1 else None)
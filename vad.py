@@ -0,0 +1,107 @@
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+FRAME_MS = 30
+ABSOLUTE_FLOOR_DB = -55.0   # anything quieter is treated as silence
+NOISE_MARGIN_DB = 10.0      # speech must be this much louder than the noise floor
+FLAT_SPEECH_DB = -40.0      # level separating speech from silence when a recording has no dynamics
+
+
+def frame_energy_db(audio: np.ndarray, rate: int, frame_ms: int = FRAME_MS) -> np.ndarray:
+    """RMS level of each frame in dBFS."""
+    frame = max(1, int(rate * frame_ms / 1000))
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = np.asarray(audio[:n_frames * frame], dtype=np.float32).reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def speech_threshold_db(energy_db: np.ndarray) -> float:
+    """Adaptive threshold from the recording's own noise floor and peak level."""
+    if not len(energy_db):
+        return ABSOLUTE_FLOOR_DB
+    noise_floor = float(np.percentile(energy_db, 10))
+    if energy_db.max() - noise_floor < NOISE_MARGIN_DB:
+        # Uniform level: all speech or all silence, so decide on absolute loudness
+        return FLAT_SPEECH_DB
+    return max(noise_floor + NOISE_MARGIN_DB, ABSOLUTE_FLOOR_DB)
+
+
+def speech_frames(audio: np.ndarray, rate: int, threshold_db: Optional[float] = None) -> np.ndarray:
+    """Boolean speech/silence decision per FRAME_MS frame."""
+    energy = frame_energy_db(audio, rate)
+    if threshold_db is None:
+        threshold_db = speech_threshold_db(energy)
+    return energy > max(threshold_db, ABSOLUTE_FLOOR_DB)
+
+
+def trim_silence(audio: np.ndarray, rate: int, padding: float = 0.2) -> Tuple[np.ndarray, Dict]:
+    """
+    Cut leading and trailing silence, keeping `padding` seconds around the speech.
+
+    Returns the trimmed audio (a view of the input) and speech statistics.
+    """
+    frame = max(1, int(rate * FRAME_MS / 1000))
+    is_speech = speech_frames(audio, rate)
+    total = len(audio) / rate
+    speech_seconds = float(is_speech.sum() * frame / rate)
+    stats = {
+        "duration": round(total, 2),
+        "speech_seconds": round(speech_seconds, 2),
+        "silence_seconds": round(total - speech_seconds, 2),
+        "speech_ratio": round(speech_seconds / total, 3) if total else 0.0,
+    }
+    if not is_speech.any():
+        stats.update(leading_silence=round(total, 2), trailing_silence=0.0)
+        return audio[:0], stats
+
+    voiced = np.flatnonzero(is_speech)
+    pad = int(padding * rate)
+    start = max(0, int(voiced[0]) * frame - pad)
+    end = min(len(audio), (int(voiced[-1]) + 1) * frame + pad)
+    stats.update(
+        leading_silence=round(start / rate, 2),
+        trailing_silence=round((len(audio) - end) / rate, 2),
+    )
+    return audio[start:end], stats
+
+
+class SilenceDetector:
+    """
+    Incremental trailing-silence tracker for auto-stopping a live recording.
+
+    The first `calibration` seconds set the noise floor. After speech has been
+    heard, `triggered` becomes True once `silence_seconds` of continuous
+    silence follow it.
+    """
+
+    def __init__(self, rate: int, silence_seconds: float, calibration: float = 0.5):
+        self.rate = rate
+        self.silence_seconds = silence_seconds
+        self.calibration_samples = int(calibration * rate)
+        self._calibration = []
+        self.threshold_db = None
+        self.heard_speech = False
+        self.silent_samples = 0
+        self.triggered = False
+
+    def feed(self, block: np.ndarray) -> bool:
+        if self.triggered or not len(block):
+            return self.triggered
+        level = 20 * np.log10(max(float(np.sqrt(np.mean(np.square(block, dtype=np.float32)))), 1e-10))
+        if self.threshold_db is None:
+            self._calibration.append(level)
+            if len(self._calibration) * len(block) < self.calibration_samples:
+                return False
+            self.threshold_db = max(float(np.median(self._calibration)) + NOISE_MARGIN_DB, ABSOLUTE_FLOOR_DB)
+            self._calibration = []
+
+        if level > self.threshold_db:
+            self.heard_speech = True
+            self.silent_samples = 0
+        elif self.heard_speech:
+            self.silent_samples += len(block)
+            self.triggered = self.silent_samples >= self.silence_seconds * self.rate
+        return self.triggered
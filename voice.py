@@ -1,31 +1,349 @@
 import os
 import datetime
 import logging
+import tempfile
 import sounddevice as sd
-from scipy.io.wavfile import write
-import whisper
+from scipy.io.wavfile import read, write
 import threading
 import numpy as np
+import re
 import time
-from typing import Optional, Dict
+from typing import Callable, Optional, Dict, List
+from speech_models import registry
+import vad
+
+WHISPER_SAMPLE_RATE = 16000
+
+
+def resample_audio(audio: np.ndarray, orig_rate: int, target_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """
+    Convert audio to mono float32 at target_rate.
+
+    Uses band-limited FFT resampling, so no separate anti-aliasing filter is
+    needed when downsampling from the capture rate.
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    if orig_rate == target_rate or audio.size == 0:
+        return np.ascontiguousarray(audio)
+
+    n_out = int(round(audio.size * target_rate / orig_rate))
+    spectrum = np.fft.rfft(audio)
+    resampled = np.fft.irfft(spectrum[:n_out // 2 + 1], n=n_out) * (n_out / audio.size)
+    return resampled.astype(np.float32)
+
+def load_wav(path: str):
+    """Read a WAV file as (sample_rate, float32 samples scaled to [-1, 1])."""
+    sample_rate, audio = read(path)
+    if audio.dtype.kind in "iu":
+        # Integer PCM; unsigned (8-bit) WAVs are offset-binary, centred on 128
+        info = np.iinfo(audio.dtype)
+        half = (int(info.max) - int(info.min) + 1) / 2
+        audio = (audio.astype(np.float64) - (int(info.min) + half)) / half
+    return sample_rate, audio.astype(np.float32)
+
+class AudioRingBuffer:
+    """Preallocated mono float32 sample buffer; once full, new samples overwrite the oldest."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=np.float32)
+        self.write_pos = 0
+        self.total = 0
+
+    def reset(self):
+        self.write_pos = 0
+        self.total = 0
+
+    @property
+    def wrapped(self) -> bool:
+        return self.total > self.capacity
+
+    def write(self, samples: np.ndarray):
+        n = len(samples)
+        if n >= self.capacity:
+            # Keep the last capacity samples, rotated so sample i still sits at i % capacity
+            self.write_pos = (self.total + n) % self.capacity
+            self.buffer[:] = np.roll(samples[-self.capacity:], self.write_pos)
+        else:
+            end = self.write_pos + n
+            if end <= self.capacity:
+                self.buffer[self.write_pos:end] = samples
+            else:
+                first = self.capacity - self.write_pos
+                self.buffer[self.write_pos:] = samples[:first]
+                self.buffer[:n - first] = samples[first:]
+            self.write_pos = end % self.capacity
+        self.total += n
+
+    def view(self) -> np.ndarray:
+        """Captured samples in order; a view into the buffer unless it has wrapped."""
+        if not self.wrapped:
+            return self.buffer[:self.total]
+        return np.concatenate((self.buffer[self.write_pos:], self.buffer[:self.write_pos]))
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """
+        Samples [start, end) counted from the beginning of the recording.
+
+        Returns a view when the range is contiguous in the buffer; samples that
+        have already been overwritten are skipped.
+        """
+        start = max(start, self.total - self.capacity, 0)
+        end = min(end, self.total)
+        if end <= start:
+            return self.buffer[:0]
+        first, last = start % self.capacity, end % self.capacity or self.capacity
+        if first < last:
+            return self.buffer[first:last]
+        return np.concatenate((self.buffer[first:], self.buffer[:last]))
+
+
+class _StreamResampler:
+    """Linear-interpolation resampler that carries its phase across callback blocks."""
+
+    def __init__(self, orig_rate: float, target_rate: float):
+        self.step = orig_rate / target_rate
+        self.pos = 1.0
+        self.last = 0.0
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        # Index 0 is the previous block's last sample so outputs can straddle blocks
+        x = np.concatenate(([self.last], block)).astype(np.float32)
+        end = len(x) - 1
+        if self.pos > end:
+            self.pos -= end
+            self.last = x[-1]
+            return x[:0]
+        positions = np.arange(self.pos, end + 1e-9, self.step)
+        self.pos = positions[-1] + self.step - end
+        self.last = x[-1]
+        return np.interp(positions, np.arange(len(x)), x).astype(np.float32)
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[\w']+", text.lower())
+
+
+def stitch_text(previous: str, new: str, max_overlap: int = 8) -> str:
+    """Append new to previous, dropping words repeated across a window boundary."""
+    new = new.strip()
+    if not previous:
+        return new
+    prev_words, new_words = _words(previous), _words(new)
+    for k in range(min(max_overlap, len(prev_words), len(new_words)), 0, -1):
+        if prev_words[-k:] == new_words[:k]:
+            # Drop the first k words of new, keeping its original spelling
+            tokens = new.split()
+            dropped = 0
+            while tokens and dropped < k:
+                dropped += len(_words(tokens.pop(0)))
+            new = " ".join(tokens)
+            break
+    return f"{previous} {new}".strip()
+
+
+class _StreamingTranscriber:
+    """
+    Transcribes a ring-mode recording window by window while it is still running.
+
+    Each window starts overlap seconds before the committed position so the
+    first words have context. Segments that end inside the trailing overlap are
+    left for the next window, so words cut by the window edge are not committed.
+    Positions are absolute sample indices from the start of the recording, also
+    after the ring has wrapped and its oldest audio is gone.
+    """
+
+    def __init__(self, recorder: "VoiceRecorder", window_seconds: float, overlap_seconds: float):
+        rate = recorder.sample_rate
+        self.recorder = recorder
+        self.rate = rate
+        self.window = int(window_seconds * rate)
+        self.overlap = int(overlap_seconds * rate)
+        self.committed = 0
+        self.dropped = 0          # samples overwritten by the ring before they were transcribed
+        self.text = ""
+        self.language = None
+        self.segments = []
+        self.error = None
+        self._source = None
+        self._source_start = 0    # absolute index of self._source[0]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _available(self) -> int:
+        """Absolute index one past the last captured sample."""
+        if self._source is not None:
+            return self._source_start + len(self._source)
+        return self.recorder._ring.total
+
+    def _earliest(self) -> int:
+        """Absolute index of the oldest sample still readable."""
+        if self._source is not None:
+            return self._source_start
+        ring = self.recorder._ring
+        return max(ring.total - ring.capacity, 0)
+
+    def _run(self):
+        while not self._stop.is_set():
+            start = max(0, self.committed - self.overlap)
+            if self._available() >= start + self.window:
+                self._transcribe_window(start, start + self.window, final=False)
+            elif self._source is not None or not self.recorder.is_recording:
+                return
+            else:
+                time.sleep(0.1)
+
+    def detach(self, audio: np.ndarray):
+        """
+        Read from this copy of the recording from now on, so the recorder's buffer can be reused.
+
+        audio must be the ring's current contents, i.e. the most recent samples
+        if the recording outgrew the buffer.
+        """
+        self._source_start = self.recorder._ring.total - len(audio)
+        self._source = audio
+
+    def _read(self, start: int, end: int) -> np.ndarray:
+        if self._source is not None:
+            offset = self._source_start
+            return self._source[max(start - offset, 0):max(end - offset, 0)]
+        # Copy: inference may still run after the next recording reuses the buffer
+        return self.recorder._ring.read(start, end).copy()
+
+    def _transcribe_window(self, start: int, end: int, final: bool):
+        earliest = self._earliest()
+        if earliest > self.committed:
+            # The ring wrapped before this audio was transcribed; it is lost
+            logging.warning(f"Streaming transcription fell behind; skipped {(earliest - self.committed) / self.rate:.1f}s of audio")
+            self.dropped += earliest - self.committed
+            self.committed = earliest
+        start = max(start, earliest)
+        audio = self._read(start, end)
+        if not len(audio):
+            return
+        context = (self.committed - start) / self.rate
+        keep_until = None if final else (end - start - self.overlap) / self.rate
+        if self.recorder.trim_silence and not vad.speech_frames(audio, self.rate).any():
+            # Nothing but silence: skip inference and move past the window
+            self.committed = end if final else max(end - self.overlap, self.committed + 1)
+            return
+        try:
+            # Windows (and their prompts) never repeat; caching them would only evict useful entries
+            result = self.recorder.model.transcribe(
+                audio,
+                use_cache=False,
+                initial_prompt=self.text[-200:] or None,
+                condition_on_previous_text=False,
+            )
+        except Exception as e:
+            logging.error(f"Streaming transcription failed: {e}")
+            self.error = str(e)
+            self.committed = end if final else end - self.overlap
+            return
+
+        self.language = self.language or result.get("language")
+        kept_end = None
+        for segment in result.get("segments", []):
+            # Midpoint inside the context region: already committed by the previous window
+            if (segment["start"] + segment["end"]) / 2 < context:
+                continue
+            # Runs into the trailing overlap: leave it for the next window, unless
+            # it is the only new segment (it runs to the window edge) and holding
+            # it back would stall the stream
+            if keep_until is not None and segment["end"] > keep_until and kept_end is not None:
+                break
+            self.text = stitch_text(self.text, segment["text"])
+            self.segments.append({
+                "start": segment["start"] + start / self.rate,
+                "end": segment["end"] + start / self.rate,
+                "text": segment["text"],
+            })
+            kept_end = segment["end"]
+
+        if final:
+            self.committed = end
+        elif kept_end is not None:
+            # Everything after the last kept segment is transcribed again by the next window
+            self.committed = max(start + int(kept_end * self.rate), self.committed + 1)
+        else:
+            # No segments at all (silence): nothing was held back, move past the window
+            self.committed = max(end - self.overlap, self.committed + 1)
+
+    def finish(self) -> Dict:
+        """Stop the background windows and transcribe only the remaining tail."""
+        self._stop.set()
+        self._thread.join()
+        recording = self._source if self._source is not None else self.recorder.captured_view()
+        end = self._available()
+        if end > self.committed:
+            self._transcribe_window(max(0, self.committed - self.overlap), end, final=True)
+        _, speech_stats = vad.trim_silence(recording, self.rate)
+        return {
+            "text": self.text,
+            "language": self.language or "unknown",
+            "segments": self.segments,
+            "speech_stats": speech_stats,
+            "dropped_seconds": round(self.dropped / self.rate, 2),
+            "error": self.error
+        }
+
 
 class VoiceRecorder:
     """Handles voice recording and transcription functionality"""
     
-    def __init__(self, model_size: str = "base", sample_rate: int = 44100):
+    def __init__(self, model_size: str = "base", sample_rate: int = 44100,
+                 device: Optional[str] = None, precision: Optional[str] = None,
+                 capture_mode: str = "list", max_duration: float = 60.0,
+                 streaming: bool = False, window_seconds: float = 10.0, overlap_seconds: float = 1.0,
+                 trim_silence: bool = True, auto_stop_silence: Optional[float] = None,
+                 engine: Optional[str] = None):
         """
         Initialize the VoiceRecorder.
         
         Args:
             model_size: Whisper model size ("tiny", "base", "small", "medium", "large")
-            sample_rate: Audio sample rate in Hz
+            sample_rate: Audio sample rate in Hz (ignored in "ring" mode, which captures at 16 kHz)
+            device: Torch device for the model (defaults to CUDA when available)
+            precision: "fp16" or "fp32" (defaults to fp16 on CUDA, fp32 on CPU)
+            capture_mode: "list" collects callback chunks and concatenates them on stop;
+                "ring" writes into a preallocated buffer of max_duration seconds
+            max_duration: Ring buffer length in seconds; older audio is overwritten beyond it
+            streaming: Transcribe overlapping windows in the background while recording
+                (implies "ring" capture); collect the result with finish_streaming()
+            window_seconds: Length of each streaming window
+            overlap_seconds: Audio shared by consecutive streaming windows
+            trim_silence: Cut leading/trailing silence before inference and skip silent windows
+            auto_stop_silence: Stop capturing after this many seconds of silence following speech
+            engine: Speech-recognition backend, see speech_models.ENGINES
+                (defaults to the ASR_ENGINE environment variable, else "whisper")
         """
+        if streaming:
+            capture_mode = "ring"
         self.model_size = model_size
-        self.sample_rate = sample_rate
+        self.capture_mode = capture_mode
+        self.streaming = streaming
+        self.window_seconds = window_seconds
+        self.overlap_seconds = overlap_seconds
+        self.sample_rate = WHISPER_SAMPLE_RATE if capture_mode == "ring" else sample_rate
+        self.max_duration = max_duration
+        self.device = device
+        self.precision = precision
+        self.engine = engine
         self.is_recording = False
         self.audio_data = []
         self.recording_thread = None
-        self.model = self._load_whisper_model()
+        self._ring = None
+        self._resampler = None
+        self._stream = None
+        self.trim_silence = trim_silence
+        self.auto_stop_silence = auto_stop_silence
+        self.auto_stopped = False
+        self._silence_detector = None
         
         # Configure logging
         logging.basicConfig(
@@ -33,21 +351,62 @@ class VoiceRecorder:
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
     
-    def _load_whisper_model(self):
-        """Load the Whisper speech recognition model"""
-        try:
-            logging.info(f"Loading Whisper model: {self.model_size}")
-            return whisper.load_model(self.model_size)
-        except Exception as e:
-            logging.error(f"Failed to load Whisper model: {e}")
-            raise
+    @property
+    def model(self):
+        """Shared speech model from the process-wide registry; weights load on first transcription"""
+        return registry.get(self.model_size, self.device, self.precision, self.engine)
     
     def _audio_callback(self, indata, frames, time, status):
         """Callback function for audio stream"""
         if status:
             logging.warning(f"Audio stream status: {status}")
-        if self.is_recording:
+        if not self.is_recording:
+            return
+        samples = indata[:, 0]
+        if self._ring is not None:
+            if self._resampler is not None:
+                samples = self._resampler.process(samples)
+            self._ring.write(samples)
+        else:
             self.audio_data.append(indata.copy())
+        if self._silence_detector is not None and self._silence_detector.feed(samples):
+            logging.info(f"Auto-stopping after {self.auto_stop_silence:.1f}s of silence")
+            self.auto_stopped = True
+            self.is_recording = False
+
+    def _open_input_stream(self):
+        """Open the input stream; in ring mode fall back to resampling if the device rejects 16 kHz"""
+        self._resampler = None
+        try:
+            return sd.InputStream(
+                samplerate=self.sample_rate,
+                channels=1,
+                callback=self._audio_callback,
+                dtype='float32'
+            )
+        except sd.PortAudioError:
+            if self._ring is None:
+                raise
+            device_rate = sd.query_devices(kind='input')['default_samplerate']
+            logging.info(f"Input device does not support {self.sample_rate} Hz; resampling from {device_rate:.0f} Hz")
+            self._resampler = _StreamResampler(device_rate, self.sample_rate)
+            return sd.InputStream(
+                samplerate=device_rate,
+                channels=1,
+                callback=self._audio_callback,
+                dtype='float32'
+            )
+
+    def captured_view(self) -> np.ndarray:
+        """
+        Samples captured so far in ring mode, without copying unless the buffer wrapped.
+
+        The view aliases the recorder's buffer and is overwritten by the next
+        recording; copy it if it has to outlive that.
+        """
+        if self._ring is None:
+            return np.zeros(0, dtype=np.float32)
+        return self._ring.view()
     
     def start_recording(self):
         """
@@ -60,18 +419,22 @@ class VoiceRecorder:
             logging.warning("Recording already in progress")
             return False
             
-        self.is_recording = True
         self.audio_data = []
+        self.auto_stopped = False
+        self._silence_detector = None
+        if self.auto_stop_silence:
+            self._silence_detector = vad.SilenceDetector(self.sample_rate, self.auto_stop_silence)
+        if self.capture_mode == "ring":
+            capacity = int(self.max_duration * self.sample_rate)
+            if self._ring is None or self._ring.capacity != capacity:
+                self._ring = AudioRingBuffer(capacity)
+            self._ring.reset()
+        self.is_recording = True
         
         def record_callback():
             """Background thread for recording"""
             try:
-                with sd.InputStream(
-                    samplerate=self.sample_rate,
-                    channels=1,
-                    callback=self._audio_callback,
-                    dtype='float32'
-                ):
+                with self._open_input_stream():
                     while self.is_recording:
                         time.sleep(0.1)
             except Exception as e:
@@ -81,6 +444,12 @@ class VoiceRecorder:
         self.recording_thread = threading.Thread(target=record_callback)
         self.recording_thread.daemon = True
         self.recording_thread.start()
+
+        if self.streaming:
+            if self._stream is not None:
+                self._stream._stop.set()
+            self._stream = _StreamingTranscriber(self, self.window_seconds, self.overlap_seconds)
+            self._stream.start()
         
         logging.info("Recording started")
         return True
@@ -92,14 +461,25 @@ class VoiceRecorder:
         Returns:
             Optional[np.ndarray]: Recorded audio data as numpy array, or None if failed
         """
-        if not self.is_recording:
+        if not self.is_recording and not self.auto_stopped:
             logging.warning("No active recording to stop")
             return None
             
         self.is_recording = False
+        self.auto_stopped = False
         
         if self.recording_thread:
             self.recording_thread.join(timeout=1)
+
+        if self._ring is not None:
+            audio_array = self.captured_view()
+            if not len(audio_array):
+                logging.warning("No audio data recorded")
+                return None
+            if self._ring.wrapped:
+                logging.warning(f"Recording exceeded {self.max_duration:.0f} seconds; kept the most recent audio")
+            logging.info(f"Recording stopped. Captured {len(audio_array)/self.sample_rate:.2f} seconds")
+            return audio_array
         
         if not self.audio_data:
             logging.warning("No audio data recorded")
@@ -135,45 +515,113 @@ class VoiceRecorder:
             logging.error(f"Error saving audio: {e}")
             return None
     
-    def transcribe(self, audio_data: np.ndarray) -> Dict:
+    def transcribe(self, audio_data: np.ndarray, use_cache: bool = True) -> Dict:
         """
         Transcribe audio data using Whisper.
         
         Args:
             audio_data: Audio data as numpy array
+            use_cache: Reuse the result of identical earlier audio (see transcription_cache)
             
         Returns:
             Dict: Transcription result containing:
                 - text: Transcribed text
                 - language: Detected language
                 - segments: Detailed segments
+                - speech_stats: Speech/silence durations (when trim_silence is on)
                 - error: Optional error message
         """
         try:
             if not isinstance(audio_data, np.ndarray):
                 raise ValueError("Audio data must be numpy array")
-                
-            # Save temporary file for Whisper
-            temp_file = "temp_recording.wav"
+
+            # Whisper accepts 16 kHz float32 samples directly, which skips the
+            # WAV write and the ffmpeg decode of the file path
+            audio = resample_audio(audio_data, self.sample_rate)
+            speech_stats = None
+            if self.trim_silence:
+                # Whisper's cost scales with audio length; don't spend it on silence
+                audio, speech_stats = vad.trim_silence(audio, WHISPER_SAMPLE_RATE)
+                logging.info(f"Speech {speech_stats['speech_seconds']}s / silence {speech_stats['silence_seconds']}s")
+                if not len(audio):
+                    result = self._error_result("No speech detected")
+                    result["speech_stats"] = speech_stats
+                    return result
+            result = self._format_result(self.model.transcribe(audio, use_cache=use_cache))
+            if speech_stats is not None:
+                result["speech_stats"] = speech_stats
+            return result
+        except Exception as e:
+            logging.error(f"Transcription failed: {e}")
+            return self._error_result(str(e))
+
+    def finish_streaming(self) -> Optional[Dict]:
+        """
+        Complete the streaming transcription of the last recording.
+
+        Only the audio after the last committed window is transcribed here.
+        Returns None if the recorder is not streaming or nothing was recorded.
+        """
+        stream, self._stream = self._stream, None
+        if stream is None:
+            return None
+        return stream.finish()
+
+    def transcription_job(self, audio_data: np.ndarray) -> Callable[[], Dict]:
+        """
+        Package the last recording for transcription on another thread.
+
+        The returned callable owns a copy of the audio (and the streaming state,
+        if any), so the recorder can start the next recording immediately.
+        """
+        audio = np.array(audio_data, copy=True)
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.detach(audio)
+            return stream.finish
+        return lambda: self.transcribe(audio)
+
+    def transcribe_via_wav(self, audio_data: np.ndarray) -> Dict:
+        """
+        Transcribe by writing a temporary WAV file and letting Whisper decode it with ffmpeg.
+
+        This is the original transcription path, kept for benchmarking against transcribe().
+        """
+        temp_file = None
+        try:
+            if not isinstance(audio_data, np.ndarray):
+                raise ValueError("Audio data must be numpy array")
+
+            fd, temp_file = tempfile.mkstemp(suffix=".wav")
+            os.close(fd)
             write(temp_file, self.sample_rate, audio_data)
-            
+
             result = self.model.transcribe(temp_file)
-            os.remove(temp_file)
-            
-            return {
-                "text": result.get("text", "").strip(),
-                "language": result.get("language", "unknown"),
-                "segments": result.get("segments", []),
-                "error": None
-            }
+            return self._format_result(result)
         except Exception as e:
             logging.error(f"Transcription failed: {e}")
-            return {
-                "text": "",
-                "language": "unknown",
-                "segments": [],
-                "error": str(e)
-            }
+            return self._error_result(str(e))
+        finally:
+            if temp_file and os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    @staticmethod
+    def _format_result(result: Dict) -> Dict:
+        return {
+            "text": result.get("text", "").strip(),
+            "language": result.get("language", "unknown"),
+            "segments": result.get("segments", []),
+            "error": None
+        }
+
+    @staticmethod
+    def _error_result(error: str) -> Dict:
+        return {
+            "text": "",
+            "language": "unknown",
+            "segments": [],
+            "error": error
+        }
     
     def record_and_transcribe(self, max_duration: float = 60.0) -> Dict:
         """
@@ -194,12 +642,7 @@ class VoiceRecorder:
         
         audio_data = self.stop_recording()
         if audio_data is None:
-            return {
-                "text": "",
-                "language": "unknown",
-                "segments": [],
-                "error": "No audio recorded"
-            }
+            return self._error_result("No audio recorded")
         
         return self.transcribe(audio_data)
 